@@ -0,0 +1,185 @@
+"""Rebuilds first-seen and removed-at times from the git history of the state files.
+
+Every automated run commits the venue's `last_known_shows.txt` (or `ruoff_shows.csv`),
+so the history holds one snapshot of the listing per day. Reading them doesn't need a
+checkout per commit: one `git log` lists the blob each commit wrote and one
+`git cat-file --batch` process streams all of those blobs. Runs of consecutive snapshots
+are parsed and diffed on a process pool, and the per-snapshot additions and removals
+are then folded, in commit order, into the earliest time each show was seen and the
+time it was last removed.
+
+Usage:
+    python backfill.py
+    python backfill.py --venue ruoff --from-csv --merge-add-times --state-db shows.db
+"""
+import argparse
+import csv
+import io
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from data_manager import merge_first_seen_times
+from show import Show
+from show_identity import canonical_key_for, match_moved_keys, rekey_timestamps
+from state_store import STATE_DB_FILE, backfill_show_history, open_state_store
+from venues import get_venues
+
+# Snapshots per process-pool task. Each task re-parses the snapshot before its run, so
+# larger runs waste less work; smaller ones spread better over the workers.
+SNAPSHOTS_PER_TASK = 64
+
+
+def list_file_versions(path, repo_dir='.'):
+    """Returns `(commit time, blob id)` for each commit that changed `path`, oldest first.
+
+    Commit times are converted to naive local ISO timestamps, matching the add-times files.
+    """
+    log = subprocess.run(
+        ['git', 'log', '--reverse', '--no-renames', '--raw', '--no-abbrev', '--format=commit %cI', '--', path],
+        cwd=repo_dir, capture_output=True, text=True, check=True).stdout
+    versions = []
+    committed_at = None
+    for line in log.splitlines():
+        if line.startswith('commit '):
+            committed_at = datetime.fromisoformat(line[7:]).astimezone().replace(tzinfo=None).isoformat()
+        elif line.startswith(':'):
+            # :<old mode> <new mode> <old blob> <new blob> <status>\t<path>
+            new_blob, status = line.split('\t', 1)[0].split()[3:5]
+            versions.append((committed_at, None if status == 'D' else new_blob))
+    return versions
+
+
+def read_blobs(blob_ids, repo_dir='.'):
+    """Streams the contents of `blob_ids` from one `git cat-file --batch` process. Returns blob id -> text."""
+    unique_ids = list(dict.fromkeys(blob_id for blob_id in blob_ids if blob_id))
+    contents = {}
+    with subprocess.Popen(['git', 'cat-file', '--batch'], cwd=repo_dir,
+                          stdin=subprocess.PIPE, stdout=subprocess.PIPE) as process:
+        # Requests are fed from another thread, so neither pipe can fill up and stall git.
+        def send_requests():
+            process.stdin.write("".join(f"{blob_id}\n" for blob_id in unique_ids).encode('ascii'))
+            process.stdin.close()
+        writer = threading.Thread(target=send_requests)
+        writer.start()
+        for blob_id in unique_ids:
+            header = process.stdout.readline().split()
+            if len(header) < 3 or header[1] != b'blob':
+                raise RuntimeError(f"git cat-file could not read blob {blob_id}")
+            contents[blob_id] = process.stdout.read(int(header[2])).decode('utf-8', errors='replace')
+            process.stdout.read(1)  # The newline after each object.
+        writer.join()
+    return contents
+
+
+def parse_snapshot(text, is_csv):
+    """Returns canonical key -> `(title, date_time_str)` for one snapshot of the listing."""
+    if text is None:
+        return {}
+    if is_csv:
+        rows = csv.reader(io.StringIO(text, newline=''))
+        header = next(rows, None)
+        if header and 'title' in header and 'date_time_str' in header:
+            title_index, date_index = header.index('title'), header.index('date_time_str')
+        else:
+            title_index, date_index = 0, 1
+        shows = [Show(row[title_index], row[date_index]) for row in rows if len(row) > max(title_index, date_index)]
+        return {show.key: (show.title, show.date_time_str) for show in shows}
+    snapshot = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if '|' in line:
+            title, _, date_time_str = line.rpartition('|')
+            snapshot[canonical_key_for(line)] = (title, date_time_str)
+    return snapshot
+
+
+def diff_snapshot_run(texts, is_csv):
+    """Diffs each snapshot in `texts[1:]` against the one before it.
+
+    `texts[0]` is the snapshot preceding the run (None before the first). Returns one
+    `(added, removed, moved)` triple per diffed snapshot, where `added` maps canonical keys
+    to `(title, date_time_str)`, `removed` is a list of canonical keys and `moved` maps the
+    old keys of shows that only changed their start time to their new keys, which are
+    also in `added`.
+    """
+    diffs = []
+    previous = parse_snapshot(texts[0], is_csv)
+    for text in texts[1:]:
+        current = parse_snapshot(text, is_csv)
+        moved = match_moved_keys(previous, current)
+        added = {key: current[key] for key in current.keys() - previous.keys()}
+        diffs.append((added, sorted(previous.keys() - current.keys() - moved.keys()), moved))
+        previous = current
+    return diffs
+
+
+def rebuild_show_history(versions, contents, is_csv, max_workers=None):
+    """Folds the diffs of every snapshot into first-seen and removed-at times.
+
+    Returns `(first_seen, removed_at, labels)`: canonical key -> earliest time the show
+    was listed, canonical key -> time it was last removed (for shows no longer listed),
+    and canonical key -> its latest `(title, date_time_str)`.
+    """
+    texts = [None] + [contents.get(blob_id) for _, blob_id in versions]
+    runs = [texts[start:start + SNAPSHOTS_PER_TASK + 1]
+            for start in range(0, len(versions), SNAPSHOTS_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        diffs = [diff for run_diffs in executor.map(diff_snapshot_run, runs, [is_csv] * len(runs))
+                 for diff in run_diffs]
+
+    first_seen, removed_at, labels = {}, {}, {}
+    for (committed_at, _), (added, removed, moved) in zip(versions, diffs):
+        if moved:
+            first_seen = rekey_timestamps(first_seen, moved)
+            for old_key in moved:
+                labels.pop(old_key, None)
+        for key, label in added.items():
+            first_seen.setdefault(key, committed_at)
+            removed_at.pop(key, None)
+            labels[key] = label
+        for key in removed:
+            removed_at[key] = committed_at
+    return first_seen, removed_at, labels
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Rebuild show first-seen times from the git history.")
+    arg_parser.add_argument('--venue', action='append', dest='venues',
+                            help="Only backfill this venue (repeatable). Defaults to every registered venue.")
+    arg_parser.add_argument('--from-csv', action='store_true',
+                            help="Read the history of the shows CSV instead of the last-known shows file.")
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (default: one per CPU).")
+    arg_parser.add_argument('--merge-add-times', action='store_true',
+                            help="Merge the rebuilt first-seen times into each venue's add-times files.")
+    arg_parser.add_argument('--state-db', nargs='?', const=STATE_DB_FILE, metavar='PATH',
+                            help=f"Also backfill this SQLite state store (default path: {STATE_DB_FILE}).")
+    args = arg_parser.parse_args()
+
+    state_conn = open_state_store(args.state_db) if args.state_db else None
+    for venue in get_venues(args.venues):
+        path = venue['shows_csv_file'] if args.from_csv else venue['last_known_shows_file']
+        start = time.perf_counter()
+        versions = list_file_versions(path)
+        contents = read_blobs(blob_id for _, blob_id in versions)
+        read_seconds = time.perf_counter() - start
+        first_seen, removed_at, labels = rebuild_show_history(versions, contents, args.from_csv, args.workers)
+        print(f"\n--- {venue['name']}: {len(versions)} versions of {path} ({len(contents)} distinct) ---")
+        print(f"Read in {read_seconds:.2f}s, diffed in {time.perf_counter() - start - read_seconds:.2f}s.")
+        print(f"{len(first_seen)} shows seen, {len(removed_at)} of them since removed.")
+        if not first_seen:
+            continue
+        if args.merge_add_times:
+            merge_first_seen_times(first_seen, venue['show_add_times_file'], venue['show_add_times_archive_file'],
+                                   labels)
+        if state_conn:
+            backfill_show_history(state_conn, venue['slug'], first_seen, removed_at, labels)
+    if state_conn:
+        state_conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Offline benchmarks for the scraping, parsing, report and calendar stages.
+
+Everything runs locally: venue pages are generated synthetically in the escaped-JSON
+format Live Nation streams, and the Calendar API is replaced by an in-memory fake with
+configurable latency. Results can be saved as JSON and compared against a baseline.
+
+Usage:
+    python benchmark.py --sizes 10 100 1000 10000 --output bench.json
+    python benchmark.py --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import calendar_scheduler
+import google_calendar_service
+import metrics
+from date_parser import parse_show_datetime
+from html_generator import generate_html_report
+from scraper import STREAM_CHUNK_SIZE, extract_shows, iter_extract_shows
+from show import DEFAULT_EVENT_TIMEZONE
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DECOY_VENUES = ("Klipsch Music Center", "Old National Centre", "Everwise Amphitheater")
+BENCHMARK_URL = "https://www.livenation.com/venue/benchmark/ruoff-music-center-events"
+
+
+def generate_venue_page(num_events, decoy_ratio=0.3, padding_bytes=2 * 1024 * 1024, seed=0):
+    """Returns a synthetic venue page with `num_events` Ruoff events plus decoy-venue events.
+
+    Events are embedded as escaped JSON inside streaming script tags, the way Live Nation
+    serves them, with `padding_bytes` of unrelated script data spread between them. A few
+    events use the older "Sat Aug 16, 2025 ▪︎ 7PM" date format.
+    """
+    rng = random.Random(seed)
+    num_decoys = int(num_events * decoy_ratio)
+    events = [("Ruoff Music Center", i) for i in range(num_events)]
+    events += [(rng.choice(DECOY_VENUES), num_events + i) for i in range(num_decoys)]
+    rng.shuffle(events)
+
+    padding_per_event = padding_bytes // max(1, len(events))
+    first_date = date.today() + timedelta(days=1)
+    parts = ['<!DOCTYPE html><html><head><title>Ruoff Music Center Events</title></head><body>']
+    for venue_name, i in events:
+        show_date = first_date + timedelta(days=i % 365)
+        if i % 10 == 0:
+            date_str = f"{show_date.strftime('%a %b')} {show_date.day}, {show_date.year} ▪︎ 7PM"
+        else:
+            date_str = show_date.isoformat()
+        filler = "".join(rng.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=padding_per_event))
+        parts.append(
+            '<script>self.__next_f.push([1,"{\\"id\\":\\"ev%d\\",\\"name\\":\\"Artist %d \\u0026 Friends Tour\\",'
+            '\\"url\\":\\"https://www.livenation.com/event/ev%d\\",\\"blob\\":\\"%s\\",'
+            '\\"venue_name\\":\\"%s\\",\\"start_date_local\\":\\"%s\\"}"])</script>'
+            % (i, i, i, filler, venue_name, date_str))
+    parts.append('</body></html>')
+    return "".join(parts)
+
+
+class FakeHttpError(Exception):
+    """Stands in for googleapiclient's HttpError, which carries the status on `resp.status`."""
+
+    def __init__(self, status, content=b''):
+        super().__init__(f"HTTP {status}")
+        self.resp = type('FakeResponse', (), {'status': status})()
+        self.content = content
+
+
+class _FakeRequest:
+    def __init__(self, service, operation, handler):
+        self._service = service
+        self._operation = operation
+        self._handler = handler
+
+    def execute(self, apply_latency=True):
+        with self._service.lock:
+            self._service.api_calls[self._operation] += 1
+        if apply_latency and self._service.latency:
+            time.sleep(self._service.latency)
+        with self._service.lock:
+            return self._handler()
+
+
+class _FakeBatch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, request_id=None):
+        self._requests.append((request_id, request))
+
+    def execute(self):
+        with self._service.lock:
+            self._service.api_calls['batch'] += 1
+        for request_id, request in self._requests:
+            try:
+                response = request.execute(apply_latency=False)
+            except Exception as e:
+                self._callback(request_id, None, e)
+            else:
+                self._callback(request_id, response, None)
+        if self._service.latency:
+            time.sleep(self._service.latency)
+
+
+class _FakeEvents:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, calendarId, timeMin=None, timeMax=None, pageToken=None, maxResults=250, **kwargs):
+        def handler():
+            items = sorted(self._service.stored_events.values(), key=lambda e: e['start']['dateTime'])
+            start = int(pageToken or 0)
+            result = {'items': items[start:start + maxResults]}
+            if start + maxResults < len(items):
+                result['nextPageToken'] = str(start + maxResults)
+            return result
+        return _FakeRequest(self._service, 'list', handler)
+
+    def insert(self, calendarId, body):
+        def handler():
+            event_id = f"evt{next(self._service.ids)}"
+            event = dict(body, id=event_id, etag=f'"{event_id}-0"', htmlLink=f"https://calendar.test/{event_id}")
+            self._service.stored_events[event_id] = event
+            return event
+        return _FakeRequest(self._service, 'insert', handler)
+
+    def patch(self, calendarId, eventId, body):
+        def handler():
+            event = self._service.get_stored_event(eventId)
+            event.update(body)
+            return event
+        return _FakeRequest(self._service, 'patch', handler)
+
+    def delete(self, calendarId, eventId):
+        def handler():
+            self._service.get_stored_event(eventId)
+            del self._service.stored_events[eventId]
+            return ''
+        return _FakeRequest(self._service, 'delete', handler)
+
+
+class FakeCalendarService:
+    """In-memory stand-in for the Calendar v3 `events()` API and batch requests.
+
+    Each executed request (and each batch round trip) sleeps for `latency` seconds
+    and is counted in `api_calls`. It is safe to share between worker threads.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.stored_events = {}
+        self.ids = itertools.count(1)
+        self.api_calls = {'list': 0, 'insert': 0, 'patch': 0, 'delete': 0, 'batch': 0}
+
+    def events(self):
+        return _FakeEvents(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+    def get_stored_event(self, event_id):
+        """Returns a stored event, raising a 404 like the API does for a missing one."""
+        if event_id not in self.stored_events:
+            raise FakeHttpError(404)
+        return self.stored_events[event_id]
+
+    def reset_counts(self):
+        for operation in self.api_calls:
+            self.api_calls[operation] = 0
+
+
+def _timed(func):
+    """Runs `func` with its progress output suppressed and returns (result, seconds)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+
+
+def run_benchmarks(num_events, latency=0.0, padding_bytes=2 * 1024 * 1024):
+    """Runs every stage for a page with `num_events` venue events and returns one result per stage."""
+    page = generate_venue_page(num_events, padding_bytes=padding_bytes)
+    results = []
+
+    def add_result(stage_name, seconds, events, **extra):
+        results.append(dict(stage=stage_name, events=events, seconds=seconds,
+                            events_per_second=events / seconds if seconds else None, **extra))
+
+    shows, seconds = _timed(lambda: extract_shows(page))
+    add_result('extract', seconds, len(shows), page_bytes=len(page.encode('utf-8')))
+
+    chunks = [page[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(page), STREAM_CHUNK_SIZE)]
+    streamed, seconds = _timed(lambda: list(iter_extract_shows(chunks)))
+    add_result('stream_extract', seconds, len(streamed))
+
+    parse_show_datetime.cache_clear()
+    year = date.today().year
+    _, seconds = _timed(lambda: [parse_show_datetime(s.date_time_str, year, DEFAULT_EVENT_TIMEZONE) for s in shows])
+    add_result('parse_dates', seconds, len(shows))
+
+    with tempfile.TemporaryDirectory() as report_dir:
+        report_path = os.path.join(report_dir, 'index.html')
+        _, seconds = _timed(lambda: generate_html_report(
+            shows, set(), {}, DEFAULT_EVENT_TIMEZONE, BENCHMARK_URL, report_path=report_path, copy_path=None))
+        add_result('html_report', seconds, len(shows), report_bytes=os.path.getsize(report_path))
+
+    service = FakeCalendarService(latency)
+    desired_events = {show.key: google_calendar_service.build_show_event_body(show, BENCHMARK_URL)
+                      for show in shows if show.parsed_date}
+    event_map = {}
+    with calendar_scheduler.ServicePool(lambda: service) as service_pool:
+        for stage_name in ('calendar_initial_sync', 'calendar_steady_sync'):
+            service.reset_counts()
+            _, seconds = _timed(lambda: google_calendar_service.sync_calendar_events(
+                lambda: service, desired_events, event_map, service_pool=service_pool,
+                rate_limiter=calendar_scheduler.TokenBucket(rate=1e9, capacity=1e9)))
+            add_result(stage_name, seconds, len(desired_events), api_calls=dict(service.api_calls))
+
+    return results
+
+
+def _print_results(num_events, results, baseline=None):
+    print(f"\n=== {num_events} events ===")
+    print(f"{'stage':<24}{'events':>8}{'seconds':>10}{'events/s':>12}  extra")
+    for result in results:
+        rate = f"{result['events_per_second']:.0f}" if result['events_per_second'] else '-'
+        extra = {k: v for k, v in result.items() if k not in ('stage', 'events', 'seconds', 'events_per_second')}
+        line = f"{result['stage']:<24}{result['events']:>8}{result['seconds']:>10.4f}{rate:>12}  {extra or ''}"
+        baseline_result = (baseline or {}).get(result['stage'])
+        if baseline_result and baseline_result['seconds']:
+            line += f"  ({result['seconds'] / baseline_result['seconds']:.2f}x baseline)"
+        print(line)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run offline benchmarks for each pipeline stage.")
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                            help="Numbers of venue events to benchmark.")
+    arg_parser.add_argument('--latency', type=float, default=0.0,
+                            help="Seconds of simulated latency per Calendar API round trip.")
+    arg_parser.add_argument('--padding-mb', type=float, default=2.0,
+                            help="Megabytes of unrelated script data in each generated page.")
+    arg_parser.add_argument('--output', help="Save the results as JSON to this path.")
+    arg_parser.add_argument('--baseline', help="Compare against results saved earlier with --output.")
+    args = arg_parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    all_results = {}
+    for num_events in args.sizes:
+        metrics.reset()
+        results = run_benchmarks(num_events, args.latency, int(args.padding_mb * 1024 * 1024))
+        all_results[str(num_events)] = results
+        baseline_by_stage = {r['stage']: r for r in baseline.get(str(num_events), [])}
+        _print_results(num_events, results, baseline_by_stage)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(all_results, f, indent=4)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Rate-limited, parallel execution of Google Calendar write operations.
+
+Operations are plain dicts -- `{'op': 'insert'|'patch'|'delete', 'key': ..., 'body': ...,
+'event_id': ...}` -- so the ones that still fail can be saved to a retry queue file and
+replayed by a later run. Each worker thread of a `ServicePool` keeps its own Calendar
+service, because the httplib2 transport underneath is not thread-safe; the workers and
+their services outlive a single run, so a long-running process authenticates them once.
+Calls are sent in small batch
+requests throttled by a shared token bucket, and retryable failures (rate-limit 403s,
+429s, 5xx responses and network errors) are retried with exponential backoff and jitter.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+MAX_WORKERS = 4
+# Calls per batch request. Large write batches to one calendar tend to trip its rate limit.
+WRITE_BATCH_SIZE = 10
+# The default Calendar API quota is 600 calls per minute per user; stay below it.
+RATE_LIMIT_PER_SECOND = 8.0
+RATE_LIMIT_BURST = 16
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 32.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded', b'quotaExceeded')
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, capacity=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` tokens are available and takes them."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_seconds = (tokens - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class ServicePool:
+    """A fixed set of worker threads that each keep their own Calendar service.
+
+    A worker builds its service the first time it runs a batch and reuses it for every
+    later batch, retry round and run for as long as the pool is open. A failed build
+    (None) is not kept, so the worker tries again on its next batch.
+    """
+
+    def __init__(self, build_service, max_workers=MAX_WORKERS):
+        self.build_service = build_service
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='calendar-writer')
+        self._worker_state = threading.local()
+
+    def get_service(self):
+        """Returns the calling worker's service, building it if it has none yet."""
+        service = getattr(self._worker_state, 'service', None)
+        if service is None:
+            service = self._worker_state.service = self.build_service()
+        return service
+
+    def map(self, func, items):
+        return self._executor.map(func, items)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_retryable(exception):
+    """Returns True for rate-limit, server and network errors worth retrying."""
+    status = getattr(getattr(exception, 'resp', None), 'status', None)
+    if status is None:
+        return isinstance(exception, OSError)
+    status = int(status)
+    if status in RETRYABLE_STATUSES:
+        return True
+    if status == 403:
+        content = getattr(exception, 'content', None) or b''
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+def backoff_delay(retry_number):
+    """Returns a full-jitter exponential backoff delay for the given retry (1-based)."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (retry_number - 1)))
+
+
+def build_request(service, calendar_id, operation):
+    """Builds the API request for one operation dict."""
+    events = service.events()
+    if operation['op'] == 'insert':
+        return events.insert(calendarId=calendar_id, body=operation['body'])
+    if operation['op'] == 'patch':
+        return events.patch(calendarId=calendar_id, eventId=operation['event_id'], body=operation['body'])
+    return events.delete(calendarId=calendar_id, eventId=operation['event_id'])
+
+
+def execute_operations(operations, service_pool, calendar_id, on_result, rate_limiter=None,
+                       batch_size=WRITE_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Runs calendar write operations on the workers of a `ServicePool`.
+
+    Args:
+        operations (list): Operation dicts to run.
+        service_pool (ServicePool): The workers, each with its own Calendar service.
+        calendar_id (str): The calendar to write to.
+        on_result: Called on the calling thread as `on_result(operation, response, exception)`
+            with each operation's final outcome. It returns a true value if a failed
+            operation should be kept for a later retry.
+        rate_limiter (TokenBucket, optional): Shared limiter; defaults to the Calendar quota.
+        batch_size (int, optional): Calls per batch request.
+        max_attempts (int, optional): Attempts per operation before giving up for this run.
+
+    Returns:
+        list: The operations to keep for a later retry, with `attempts` and `last_error` set.
+    """
+    rate_limiter = rate_limiter or TokenBucket()
+
+    def run_batch(batch):
+        service = service_pool.get_service()
+        if not service:
+            error = RuntimeError("Calendar service is not available.")
+            return [(operation, None, error) for operation in batch]
+
+        rate_limiter.acquire(len(batch))
+        outcomes = {}
+
+        def on_response(request_id, response, exception):
+            outcomes[request_id] = (response, exception)
+
+        http_batch = service.new_batch_http_request(callback=on_response)
+        for i, operation in enumerate(batch):
+            http_batch.add(build_request(service, calendar_id, operation), request_id=str(i))
+        try:
+            http_batch.execute()
+        except Exception as e:
+            # The batch request itself failed, so every call in it did.
+            for i in range(len(batch)):
+                outcomes.setdefault(str(i), (None, e))
+        metrics.increment('calendar_batch_requests')
+        metrics.increment('calendar_api_calls', len(batch))
+        return [(operation, *outcomes.get(str(i), (None, RuntimeError("No response in batch."))))
+                for i, operation in enumerate(batch)]
+
+    pending = list(operations)
+    to_retry_later = []
+    attempt = 0
+    while pending:
+        attempt += 1
+        if attempt > 1:
+            delay = backoff_delay(attempt - 1)
+            print(f"Retrying {len(pending)} calendar operation(s) in {delay:.1f}s...")
+            metrics.increment('calendar_retries', len(pending))
+            time.sleep(delay)
+
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        pending = []
+        for results in service_pool.map(run_batch, batches):
+            for operation, response, exception in results:
+                if exception is not None and is_retryable(exception) and attempt < max_attempts:
+                    pending.append(operation)
+                elif on_result(operation, response, exception) and exception is not None:
+                    to_retry_later.append(dict(operation, attempts=operation.get('attempts', 0) + attempt,
+                                               last_error=str(exception)))
+
+    return to_retry_later
@@ -1,47 +1,192 @@
 import csv
+import gzip
+import hashlib
+import io
 import json
+import os
+from datetime import date
+
+from date_parser import parse_show_datetime
+from output_writer import write_if_changed
+from show_identity import canonical_key_for, index_show_labels, rekey_event_map, rekey_timestamps
 
 def save_shows_to_csv(shows_data, csv_file_path):
-    """Saves show data to a CSV file."""
+    """Saves a list of Shows to a CSV file."""
     if not shows_data:
         print("No show data to save.")
         return
     
     field_keys = ["title", "date_time_str"]
 
-    with open(csv_file_path, 'w', newline='', encoding='utf-8') as output_file:
-        dict_writer = csv.DictWriter(output_file, fieldnames=field_keys)
-        dict_writer.writeheader()
-        rows_to_write = [{k: show.get(k) for k in field_keys} for show in shows_data]
-        dict_writer.writerows(rows_to_write)
+    output_file = io.StringIO(newline='')
+    dict_writer = csv.DictWriter(output_file, fieldnames=field_keys)
+    dict_writer.writeheader()
+    rows_to_write = [{k: getattr(show, k) for k in field_keys} for show in shows_data]
+    dict_writer.writerows(rows_to_write)
 
-    print(f"Saved {len(shows_data)} shows to {csv_file_path}")
+    if write_if_changed(csv_file_path, output_file.getvalue()):
+        print(f"Saved {len(shows_data)} shows to {csv_file_path}")
+    else:
+        print(f"{csv_file_path} is unchanged.")
 
 def get_last_known_shows(last_known_shows_file_path):
-    """Reads the last known shows from a file."""
+    """Reads the last known shows from a file as a canonical key -> `(title, date_time_str)` mapping."""
     try:
         with open(last_known_shows_file_path, 'r', encoding='utf-8') as f:
-            return set(line.strip() for line in f)
+            return index_show_labels(line.strip() for line in f)
     except FileNotFoundError:
-        return set()
+        return {}
 
 def save_current_shows_as_known(shows_data, last_known_shows_file_path):
-    """Saves the current shows to a file for future comparison."""
+    """Saves the current shows to a file for future comparison, as `title|date_time_str` lines."""
     if not shows_data:
         return
-    with open(last_known_shows_file_path, 'w', encoding='utf-8') as f:
-        for show in shows_data:
-            f.write(f"{show['title']}|{show['date_time_str']}\n")
+    write_if_changed(last_known_shows_file_path,
+                     "".join(f"{show.title}|{show.date_time_str}\n" for show in shows_data))
+
+def _listed_keys(timestamps, labels):
+    """Returns `timestamps` keyed by each show's listed `title|date_time_str` where `labels` has it.
+
+    Add-times files keep the keys as listed, like `last_known_shows.txt`; they are only
+    made canonical in memory.
+    """
+    return {"|".join(labels[key]) if key in labels else key: timestamp for key, timestamp in timestamps.items()}
 
 def load_show_add_times(show_add_times_file_path):
-    """Loads the timestamp of when each show was first added."""
+    """Loads the timestamp of when each show was first added, keyed by canonical show key."""
+    try:
+        with open(show_add_times_file_path, 'r', encoding='utf-8') as f:
+            return rekey_timestamps(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def load_show_add_time_labels(show_add_times_file_path):
+    """Returns canonical key -> `(title, date_time_str)` for the shows in an add-times file, as stored."""
     try:
         with open(show_add_times_file_path, 'r', encoding='utf-8') as f:
+            return index_show_labels(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_show_add_times(add_times, show_add_times_file_path, labels=None):
+    """Saves the show addition timestamps to a file.
+
+    `labels` maps canonical keys to the `(title, date_time_str)` to store them under.
+    """
+    write_if_changed(show_add_times_file_path, json.dumps(_listed_keys(add_times, labels or {}), indent=4))
+
+def _load_archive(archive_file_path):
+    """Returns the add-times archive as stored, keyed by listed show keys."""
+    try:
+        with gzip.open(archive_file_path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, OSError, json.JSONDecodeError):
+        return {}
+
+def _save_archive(archive, archive_file_path, labels):
+    """Writes the add-times archive gzip-compressed, under listed keys where `labels` has them."""
+    # mtime=0 keeps the archive bytes identical for identical contents.
+    archive_json = json.dumps(_listed_keys(archive, labels), indent=1, sort_keys=True).encode('utf-8')
+    write_if_changed(archive_file_path, gzip.compress(archive_json, mtime=0))
+
+def load_archived_show_add_times(archive_file_path):
+    """Loads the gzip-compressed archive of add times for past and delisted shows."""
+    return rekey_timestamps(_load_archive(archive_file_path))
+
+def compact_show_add_times(add_times, current_show_keys, archive_file_path, timezone='America/New_York',
+                           labels=None):
+    """Moves add times for shows that are no longer listed or already past into the archive.
+
+    If `current_show_keys` is None, only past-dated shows are moved. The archive is only
+    rewritten when something moves; `labels` gives the listed keys to store the moved
+    shows under. Returns the compacted add-times dict.
+    """
+    today = date.today()
+    hot, moved = {}, {}
+    for show_key, added_at in add_times.items():
+        if current_show_keys is not None:
+            is_stale = show_key not in current_show_keys
+        else:
+            show_date = parse_show_datetime(show_key.rpartition('|')[2], today.year, timezone)
+            is_stale = show_date is not None and show_date.date() < today
+        (moved if is_stale else hot)[show_key] = added_at
+
+    if moved:
+        stored_archive = _load_archive(archive_file_path)
+        archive = rekey_timestamps(stored_archive)
+        for show_key, added_at in moved.items():
+            archive[show_key] = min(added_at, archive.get(show_key, added_at))
+        _save_archive(archive, archive_file_path, {**index_show_labels(stored_archive), **(labels or {})})
+        print(f"Archived {len(moved)} past or delisted show add times to {archive_file_path}")
+
+    return hot
+
+def compute_shows_hash(shows_data):
+    """Returns a content hash of the show list that does not depend on page order.
+
+    It covers the titles and dates exactly as listed, so a show moved to another time,
+    or retitled in a way the canonical key ignores, still counts as a change.
+    """
+    show_lines = sorted(f"{show.title}|{show.date_time_str}" for show in shows_data)
+    return hashlib.sha256("\n".join(show_lines).encode('utf-8')).hexdigest()
+
+def load_scrape_cache(scrape_cache_file_path):
+    """Loads the HTTP validators and show hash recorded by the last complete run."""
+    try:
+        with open(scrape_cache_file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
-def save_show_add_times(add_times, show_add_times_file_path):
-    """Saves the show addition timestamps to a file."""
-    with open(show_add_times_file_path, 'w', encoding='utf-8') as f:
-        json.dump(add_times, f, indent=4) 
\ No newline at end of file
+def save_scrape_cache(scrape_cache, scrape_cache_file_path):
+    """Saves the HTTP validators and show hash for the next run."""
+    write_if_changed(scrape_cache_file_path, json.dumps(scrape_cache, indent=4))
+
+def load_calendar_event_map(event_map_file_path):
+    """Loads the mapping from canonical show key to synced Google Calendar event."""
+    try:
+        with open(event_map_file_path, 'r', encoding='utf-8') as f:
+            return rekey_event_map(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_calendar_event_map(event_map, event_map_file_path):
+    """Saves the mapping from show key to synced Google Calendar event."""
+    write_if_changed(event_map_file_path, json.dumps(event_map, indent=4, sort_keys=True))
+
+def load_calendar_retry_queue(queue_file_path):
+    """Loads the calendar operations left over from earlier runs."""
+    try:
+        with open(queue_file_path, 'r', encoding='utf-8') as f:
+            return [dict(operation, key=canonical_key_for(operation['key'])) for operation in json.load(f)]
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def save_calendar_retry_queue(operations, queue_file_path):
+    """Saves the calendar operations that still need to be retried."""
+    if not operations and not os.path.exists(queue_file_path):
+        return
+    write_if_changed(queue_file_path, json.dumps(operations, indent=4, sort_keys=True))
+
+def merge_first_seen_times(first_seen, show_add_times_file_path, archive_file_path, labels=None):
+    """Merges rebuilt first-seen times into the add-times file and its archive, keeping the earliest.
+
+    Shows already in the add-times file are updated there; all others go to the archive,
+    where they are picked up again if the show is relisted. `labels` maps canonical keys
+    to their listed `(title, date_time_str)`. Returns the number of shows whose recorded
+    time moved earlier or was added.
+    """
+    add_times = load_show_add_times(show_add_times_file_path)
+    stored_archive = _load_archive(archive_file_path)
+    archive = rekey_timestamps(stored_archive)
+    updated = 0
+    for show_key, seen_at in first_seen.items():
+        target = add_times if show_key in add_times else archive
+        if show_key not in target or seen_at < target[show_key]:
+            target[show_key] = seen_at
+            updated += 1
+    save_show_add_times(add_times, show_add_times_file_path,
+                        {**load_show_add_time_labels(show_add_times_file_path), **(labels or {})})
+    _save_archive(archive, archive_file_path, {**index_show_labels(stored_archive), **(labels or {})})
+    print(f"Merged first-seen times for {updated} shows into {show_add_times_file_path} and {archive_file_path}.")
+    return updated
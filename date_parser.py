@@ -1,12 +1,97 @@
 import re
 from datetime import datetime
+from functools import lru_cache
 from dateutil import parser as dateutil_parser
 from dateutil import tz
 
+# Distinct (string, year, timezone) combinations remembered by parse_show_datetime.
+PARSE_CACHE_SIZE = 4096
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TIME_PATTERN = re.compile(r'(\d{1,2}(:\d{2})?\s*(AM|PM))', re.IGNORECASE)
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+TRAILING_SEPARATOR_PATTERN = re.compile(r'[,-]$')
+# The feed currently sends plain ISO dates such as "2026-08-23".
+ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2})?)?')
+# Older feed format once separators are stripped, e.g. "Sat Aug 16, 2025 7PM".
+KNOWN_FORMATS = ('%a %b %d, %Y %I%p', '%a %b %d, %Y %I:%M%p')
+WEEKDAY_ABBREVIATIONS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+# A listing without a clock time ("2026-12-31", "Tue Jun 10") only gives the show's date.
+TIME_OF_DAY_PATTERN = re.compile(r'\d{1,2}:\d{2}|\d{1,2}\s*[AaPp]\.?[Mm]\b')
+
+_parse_counts = {'fast_path': 0, 'fallback': 0, 'failed': 0}
+
+
+def has_time_of_day(date_str):
+    """Returns True if a listing's date string includes a clock time, not just a date."""
+    return TIME_OF_DAY_PATTERN.search(date_str) is not None
+
+
+@lru_cache(maxsize=None)
+def get_timezone(timezone_str):
+    """Returns the tzinfo for `timezone_str`, looking each name up only once."""
+    return tz.gettz(timezone_str)
+
+
+def _parse_fast_path(date_str):
+    """Parses strings in a known, fixed format without dateutil. Returns None if none applies."""
+    if ISO_DATE_PATTERN.fullmatch(date_str):
+        return datetime.fromisoformat(date_str)
+    for date_format in KNOWN_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_general(date_str, current_year):
+    """Parses free-form date strings with dateutil, filling in and rolling over the year."""
+    # Try to extract time first if present
+    time_match = TIME_PATTERN.search(date_str)
+    event_time_str = None
+    date_part_str = date_str
+
+    if time_match:
+        event_time_str = time_match.group(1)
+        # Remove the time part to avoid confusion for dateutil.parser if it's just a date
+        date_part_str = date_str.replace(event_time_str, "").strip()
+        # Clean up common artifacts like trailing commas or hyphens after removing time
+        date_part_str = TRAILING_SEPARATOR_PATTERN.sub('', date_part_str).strip()
+
+    # If date_part_str becomes empty or is just a day of week, it's problematic
+    if not date_part_str or date_part_str.lower() in WEEKDAY_ABBREVIATIONS:
+        # This might happen if the original string was just "7PM" or "Mon 7PM", which is unlikely for this scraper
+        print(f"Warning: Could not reliably parse date from '{date_str}'. Date part is '{date_part_str}'.")
+        return None
+
+    # Add current year if year is likely missing
+    has_year = YEAR_PATTERN.search(date_part_str) is not None
+    if not has_year:
+        date_part_str += f", {current_year}"
+
+    full_datetime_str_to_parse = date_part_str
+    if event_time_str:
+        full_datetime_str_to_parse += " " + event_time_str
+
+    parsed_dt = dateutil_parser.parse(full_datetime_str_to_parse)
+
+    # If the parsed date is in the past (e.g. "Jan 5" parsed for current year, but it's Dec 2024, so Jan 5 means Jan 5, 2025)
+    # and the original string didn't explicitly state the year.
+    if not YEAR_PATTERN.search(date_str) and parsed_dt < datetime.now().replace(tzinfo=None):
+        parsed_dt = parsed_dt.replace(year=parsed_dt.year + 1)
+
+    return parsed_dt
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_show_datetime(date_str, current_year, default_timezone_str):
     """
     Parses a variety of date/time string formats into a timezone-aware datetime object.
-    Examples: "Tue Jun 10", "Tue Jun 10, 2025 ▪︎ 7PM", "Jul 4 ▪︎ 8:00 PM"
+    Examples: "2026-08-23", "Tue Jun 10", "Tue Jun 10, 2025 ▪︎ 7PM", "Jul 4 ▪︎ 8:00 PM"
+
+    ISO dates and the known Live Nation formats are parsed directly; anything else falls
+    back to dateutil. Results are memoized per (string, year, timezone).
     """
     if not date_str:
         return None
@@ -14,48 +99,20 @@ def parse_show_datetime(date_str, current_year, default_timezone_str):
     try:
         # Normalize separators and remove extra spaces
         date_str = date_str.replace("▪︎", "").replace("•", "").strip()
-        date_str = re.sub(r'\s+', ' ', date_str) # Replace multiple spaces with one
+        date_str = WHITESPACE_PATTERN.sub(' ', date_str) # Replace multiple spaces with one
 
-        # Attempt to parse with dateutil.parser
-        # If the year is missing, dateutil might assume current year, which is usually correct for upcoming events.
-        # However, we need to ensure it handles cases like "Dec 10" (current year) vs "Jan 5" (next year if current month is Dec)
-        
-        # Try to extract time first if present
-        time_match = re.search(r'(\d{1,2}(:\d{2})?\s*(AM|PM))', date_str, re.IGNORECASE)
-        event_time_str = None
-        date_part_str = date_str
-
-        if time_match:
-            event_time_str = time_match.group(1)
-            # Remove the time part to avoid confusion for dateutil.parser if it's just a date
-            date_part_str = date_str.replace(event_time_str, "").strip()
-            # Clean up common artifacts like trailing commas or hyphens after removing time
-            date_part_str = re.sub(r'[,-]$', '', date_part_str).strip()
-
-        # If date_part_str becomes empty or is just a day of week, it's problematic
-        if not date_part_str or date_part_str.lower() in ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']:
-             # This might happen if the original string was just "7PM" or "Mon 7PM", which is unlikely for this scraper
-             print(f"Warning: Could not reliably parse date from '{date_str}'. Date part is '{date_part_str}'.")
-             return None
-
-
-        # Add current year if year is likely missing
-        if not re.search(r'\b(20\d{2})\b', date_part_str): # if no 4-digit year found
-            date_part_str += f", {current_year}"
-
-        full_datetime_str_to_parse = date_part_str
-        if event_time_str:
-            full_datetime_str_to_parse += " " + event_time_str
-        
-        parsed_dt = dateutil_parser.parse(full_datetime_str_to_parse)
-
-        # If the parsed date is in the past (e.g. "Jan 5" parsed for current year, but it's Dec 2024, so Jan 5 means Jan 5, 2025)
-        # and the original string didn't explicitly state the year.
-        if not re.search(r'\b(20\d{2})\b', date_str) and parsed_dt < datetime.now().replace(tzinfo=None):
-            parsed_dt = parsed_dt.replace(year=parsed_dt.year + 1)
+        parsed_dt = _parse_fast_path(date_str)
+        if parsed_dt is not None:
+            _parse_counts['fast_path'] += 1
+        else:
+            _parse_counts['fallback'] += 1
+            parsed_dt = _parse_general(date_str, current_year)
+            if parsed_dt is None:
+                _parse_counts['failed'] += 1
+                return None
 
         # Make the datetime timezone-aware
-        target_tz = tz.gettz(default_timezone_str)
+        target_tz = get_timezone(default_timezone_str)
         if target_tz is None: # Fallback if tz.gettz returns None
             print(f"Warning: Timezone '{default_timezone_str}' not found. Using system local time as naive.")
             return parsed_dt # Returns naive, or could raise error
@@ -69,5 +126,12 @@ def parse_show_datetime(date_str, current_year, default_timezone_str):
         return aware_dt
 
     except Exception as e:
+        _parse_counts['failed'] += 1
         print(f"Error parsing date string '{date_str}': {e}")
-        return None 
\ No newline at end of file
+        return None
+
+
+def get_parse_stats():
+    """Returns how many date strings took the fast path, fell back to dateutil, failed or hit the cache."""
+    cache_info = parse_show_datetime.cache_info()
+    return dict(_parse_counts, cache_hits=cache_info.hits)
@@ -3,38 +3,297 @@ import datetime
 import sys
 import json
 import logging
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import threading
+# The Google client libraries are imported inside the functions that need them, so
+# runs that have nothing to sync never pay for loading them.
 from dateutil import parser as dateutil_parser
 from dateutil import tz
 
+import calendar_scheduler
+import metrics
+
 # If modifying these SCOPES, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 CREDENTIALS_FILE = 'credentials.json'
 TARGET_CALENDAR_ID = '18d5d40ddafe357ca7f0dbadc1d0382fca050d83669e262a27287c1e27990062@group.calendar.google.com'
+# Local copy of the Calendar v3 discovery document, pinned from the one bundled with
+# google-api-python-client the first time a service is built.
+DISCOVERY_DOCUMENT_FILE = 'calendar_v3_discovery.json'
+
+# Shows are listed without an end time, so events are given a fixed length.
+DEFAULT_EVENT_DURATION = datetime.timedelta(hours=3)
+
+LIST_PAGE_SIZE = 2500
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_calendar_service():
-    """Gets the Google Calendar service using service account authentication."""
+_calendar_service = None
+_credentials = None
+_credentials_lock = threading.Lock()
+_service_pool = None
+
+def _http_error():
+    """Returns googleapiclient's HttpError, importing it only when an API call has failed."""
+    from googleapiclient.errors import HttpError
+    return HttpError
+
+def _load_discovery_document():
+    """Returns the pinned Calendar discovery document, creating the local copy if needed."""
     try:
-        logger.info("Attempting to use service account authentication")
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE,
-            scopes=SCOPES
-        )
-        service = build('calendar', 'v3', credentials=credentials)
+        with open(DISCOVERY_DOCUMENT_FILE, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    from googleapiclient.discovery_cache import get_static_doc
+    discovery_document = get_static_doc('calendar', 'v3')
+    if discovery_document:
+        with open(DISCOVERY_DOCUMENT_FILE, 'w', encoding='utf-8') as f:
+            f.write(discovery_document)
+    return discovery_document
+
+def _get_credentials():
+    """Loads the service account credentials once; every service built afterwards shares them."""
+    global _credentials
+    # Writer threads build their services concurrently.
+    with _credentials_lock:
+        if _credentials is None:
+            from google.oauth2 import service_account
+
+            logger.info("Attempting to use service account authentication")
+            _credentials = service_account.Credentials.from_service_account_file(
+                CREDENTIALS_FILE,
+                scopes=SCOPES
+            )
+        return _credentials
+
+def build_calendar_service():
+    """Builds a new Google Calendar service using service account authentication.
+
+    The service is built offline from the pinned discovery document, without the
+    discovery cache. Services are not thread-safe, so each worker thread needs its own.
+    """
+    try:
+        from googleapiclient.discovery import build, build_from_document
+
+        credentials = _get_credentials()
+        discovery_document = _load_discovery_document()
+        if discovery_document:
+            service = build_from_document(discovery_document, credentials=credentials)
+        else:
+            service = build('calendar', 'v3', credentials=credentials, cache_discovery=False)
         logger.info("Successfully authenticated with service account")
         return service
     except Exception as e:
         logger.error(f"Service account authentication failed: {e}")
         return None
 
-def add_event_to_calendar(service, summary, start_datetime, end_datetime, description=None, timezone='America/New_York'):
-    """Adds an event to the primary Google Calendar.
+def get_calendar_service():
+    """Gets the Google Calendar service, building it once and reusing it for the rest of the process."""
+    global _calendar_service
+    if _calendar_service is None:
+        _calendar_service = build_calendar_service()
+    return _calendar_service
+
+def get_service_pool():
+    """Returns the process-wide pool of Calendar writer threads (see `calendar_scheduler.ServicePool`)."""
+    global _service_pool
+    if _service_pool is None:
+        _service_pool = calendar_scheduler.ServicePool(build_calendar_service)
+    return _service_pool
+
+def build_event_body(summary, start_datetime, end_datetime, description=None, timezone='America/New_York'):
+    """Builds the Calendar API resource body for a show event."""
+    return {
+        'summary': summary,
+        'description': description,
+        'start': {
+            'dateTime': start_datetime.isoformat(),
+            'timeZone': timezone,
+        },
+        'end': {
+            'dateTime': end_datetime.isoformat(),
+            'timeZone': timezone,
+        },
+    }
+
+def build_show_event_body(show, source_url, timezone='America/New_York', duration=DEFAULT_EVENT_DURATION):
+    """Builds the Calendar API resource body for a Show with a parsed date."""
+    return build_event_body(
+        summary=show.title,
+        start_datetime=show.parsed_date,
+        end_datetime=show.parsed_date + duration,
+        description=f"Show: {show.title}\nSource: {source_url}\nScraped: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        timezone=timezone
+    )
+
+def event_index_key(summary, start):
+    """Returns the (summary, UTC start) key used to match scraped shows to calendar events.
+
+    `start` is an event's `start` dict as returned by the API or built by `build_event_body`.
+    """
+    if 'dateTime' in start:
+        start_str = dateutil_parser.isoparse(start['dateTime']).astimezone(tz.UTC).isoformat()
+    else:
+        start_str = start.get('date')
+    return (summary, start_str)
+
+def list_calendar_events(service, time_min, time_max, calendar_id=TARGET_CALENDAR_ID):
+    """Pages through every event between `time_min` and `time_max` once.
+
+    Returns:
+        dict: Events keyed by `event_index_key`.
+    """
+    index = {}
+    page_token = None
+    while True:
+        events_result = service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
+            singleEvents=True,
+            maxResults=LIST_PAGE_SIZE,
+            pageToken=page_token
+        ).execute()
+        metrics.increment('calendar_api_calls')
+        for event_item in events_result.get('items', []):
+            if 'start' in event_item:
+                index[event_index_key(event_item.get('summary'), event_item['start'])] = event_item
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return index
+
+def _event_map_entry(event, body):
+    """Returns what the show-to-event map remembers about a synced event."""
+    return {
+        'id': event['id'],
+        'etag': event.get('etag'),
+        'summary': body['summary'],
+        'start': body['start']['dateTime'],
+        'end': body['end']['dateTime'],
+    }
+
+def apply_calendar_operations(operations, event_map, calendar_id=TARGET_CALENDAR_ID, service_pool=None,
+                              rate_limiter=None):
+    """Runs calendar write operations through the rate-limited scheduler and updates `event_map`.
+
+    Args:
+        operations (list): Operation dicts (see `calendar_scheduler`), e.g. from a retry queue.
+        event_map (dict): Show key -> synced event entry. Updated in place.
+        calendar_id (str, optional): The calendar to write to. Defaults to TARGET_CALENDAR_ID.
+        service_pool (calendar_scheduler.ServicePool, optional): The writer threads to use.
+            Defaults to the process-wide pool from `get_service_pool`.
+        rate_limiter (calendar_scheduler.TokenBucket, optional): Overrides the default API quota.
+
+    An event deleted outside this script (404/410) counts as removed for a delete; a patch
+    of such an event is sent again as an insert.
+
+    Returns:
+        list: The operations that failed and should be retried on a later run.
+    """
+    reinserts = []
+
+    def on_result(operation, response, exception):
+        action, key = operation['op'], operation['key']
+        if exception is not None:
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            if status in (404, 410) and action in ('delete', 'patch'):
+                event_map.pop(key, None)
+                if action == 'patch':
+                    print(f"Event for '{key}' is gone from calendar {calendar_id}; creating it again.")
+                    reinserts.append({'op': 'insert', 'key': key, 'body': operation['body']})
+                return False
+            print(f"An API error occurred while trying to {action} event for '{key}': {exception}")
+            return True
+        if action == 'delete':
+            print(f"Event removed from calendar {calendar_id}: {key}")
+            event_map.pop(key, None)
+        else:
+            verb = 'created' if action == 'insert' else 'updated'
+            print(f"Event {verb} in calendar {calendar_id}: {response.get('htmlLink')}")
+            event_map[key] = _event_map_entry(response, operation['body'])
+        return False
+
+    service_pool = service_pool or get_service_pool()
+    failed = calendar_scheduler.execute_operations(operations, service_pool, calendar_id, on_result,
+                                                   rate_limiter=rate_limiter)
+    if reinserts:
+        failed += calendar_scheduler.execute_operations(reinserts, service_pool, calendar_id, on_result,
+                                                        rate_limiter=rate_limiter)
+    return failed
+
+def sync_calendar_events(get_service, desired_events, event_map, calendar_id=TARGET_CALENDAR_ID, service_pool=None,
+                         rate_limiter=None):
+    """Brings the calendar in line with `desired_events` using the persisted `event_map`.
+
+    The diff between the desired show keys and the mapped ones gives the exact set
+    of inserts, patches and deletes; only those reach the API, so a run where nothing
+    changed makes no calendar calls and never builds the service. Before inserting,
+    the season window is listed once so events created before the map existed are
+    adopted instead of duplicated. Shows that drop off the listing after they have
+    taken place are forgotten rather than deleted.
+
+    Args:
+        get_service: Callable returning an authorized Calendar service, or None.
+        desired_events (dict): Event bodies (see `build_event_body`) keyed by show key.
+        event_map (dict): Show key -> synced event entry. Updated in place.
+        calendar_id (str, optional): The calendar to sync. Defaults to TARGET_CALENDAR_ID.
+        service_pool, rate_limiter (optional): Passed to `apply_calendar_operations`.
+
+    Returns:
+        list: The operations that failed and should be retried on a later run, or None if
+            the calendar could not be reached at all.
+    """
+    now = datetime.datetime.now(tz.UTC)
+    to_insert = [key for key in desired_events if key not in event_map]
+    to_patch = [key for key in desired_events if key in event_map
+                and _event_map_entry(event_map[key], desired_events[key]) != event_map[key]]
+    to_delete = []
+    for key in set(event_map) - set(desired_events):
+        if dateutil_parser.isoparse(event_map[key]['start']) < now:
+            del event_map[key]
+        else:
+            to_delete.append(key)
+
+    if not (to_insert or to_patch or to_delete):
+        print("Calendar already up to date.")
+        return []
+
+    print(f"Calendar changes: {len(to_insert)} to add, {len(to_patch)} to update, {len(to_delete)} to remove.")
+    service = get_service()
+    if not service:
+        print("Calendar service is not available.")
+        return None
+
+    if to_insert:
+        bodies = [desired_events[key] for key in to_insert]
+        starts = [dateutil_parser.isoparse(body['start']['dateTime']) for body in bodies]
+        ends = [dateutil_parser.isoparse(body['end']['dateTime']) for body in bodies]
+        try:
+            existing = list_calendar_events(service, min(starts) - datetime.timedelta(days=1),
+                                            max(ends) + datetime.timedelta(days=1), calendar_id)
+        except _http_error() as error:
+            print(f"An API error occurred while listing existing events: {error}")
+            return None
+        for key in list(to_insert):
+            existing_event = existing.get(event_index_key(desired_events[key]['summary'], desired_events[key]['start']))
+            if existing_event:
+                event_map[key] = _event_map_entry(existing_event, desired_events[key])
+                to_insert.remove(key)
+
+    operations = (
+        [{'op': 'insert', 'key': key, 'body': desired_events[key]} for key in to_insert]
+        + [{'op': 'patch', 'key': key, 'event_id': event_map[key]['id'], 'body': desired_events[key]}
+           for key in to_patch]
+        + [{'op': 'delete', 'key': key, 'event_id': event_map[key]['id']} for key in to_delete]
+    )
+    return apply_calendar_operations(operations, event_map, calendar_id, service_pool, rate_limiter)
+
+def add_event_to_calendar(service, summary, start_datetime, end_datetime, description=None, timezone='America/New_York',
+                          calendar_id=TARGET_CALENDAR_ID):
+    """Adds an event to the target Google Calendar.
 
     Args:
         service: Authorized Google Calendar API service instance.
@@ -43,6 +302,7 @@ def add_event_to_calendar(service, summary, start_datetime, end_datetime, descri
         end_datetime (datetime.datetime): The end date and time of the event.
         description (str, optional): A description for the event. Defaults to None.
         timezone (str, optional): The timezone for the event. Defaults to 'America/New_York'.
+        calendar_id (str, optional): The calendar to add the event to. Defaults to TARGET_CALENDAR_ID.
 
     Returns:
         dict: The created event object, or None if an error occurred or event already exists.
@@ -60,13 +320,14 @@ def add_event_to_calendar(service, summary, start_datetime, end_datetime, descri
         time_max = start_datetime + datetime.timedelta(minutes=5)
 
         events_result = service.events().list(
-            calendarId=TARGET_CALENDAR_ID,
+            calendarId=calendar_id,
             timeMin=time_min.isoformat(),
             timeMax=time_max.isoformat(),
             # q=summary,  # Removing this as it's a broad search. We'll filter by exact title in the loop.
             singleEvents=True,
             orderBy='startTime'
         ).execute()
+        metrics.increment('calendar_api_calls')
         events = events_result.get('items', [])
 
         # If any event in the window has the same title, we assume it's a duplicate.
@@ -75,28 +336,18 @@ def add_event_to_calendar(service, summary, start_datetime, end_datetime, descri
                 print(f"Event '{summary}' starting around the same time already exists. Skipping.")
                 return None
 
-    except HttpError as error:
+    except _http_error() as error:
         print(f"An API error occurred while checking for existing events: {error}")
         # Decide if you want to proceed or not. For now, we'll try to add.
 
-    event = {
-        'summary': summary,
-        'description': description,
-        'start': {
-            'dateTime': start_datetime.isoformat(),
-            'timeZone': timezone,
-        },
-        'end': {
-            'dateTime': end_datetime.isoformat(),
-            'timeZone': timezone,
-        },
-    }
+    event = build_event_body(summary, start_datetime, end_datetime, description, timezone)
 
     try:
-        created_event = service.events().insert(calendarId=TARGET_CALENDAR_ID, body=event).execute()
-        print(f"Event created in calendar {TARGET_CALENDAR_ID}: {created_event.get('htmlLink')}")
+        metrics.increment('calendar_api_calls')
+        created_event = service.events().insert(calendarId=calendar_id, body=event).execute()
+        print(f"Event created in calendar {calendar_id}: {created_event.get('htmlLink')}")
         return created_event
-    except HttpError as error:
+    except _http_error() as error:
         print(f'An API error occurred while creating event: {error}')
         return None
 
@@ -1,28 +1,21 @@
+import html
 import os
-import shutil
+import re
 from datetime import datetime
 from dateutil import tz
 from dateutil import parser as dateutil_parser
 
-from date_parser import parse_show_datetime
+from output_writer import write_chunks_if_changed, write_compressed_siblings, mirror_file
 
-def generate_html_report(shows_data, new_shows_set, show_add_times, default_timezone, url):
-    """Generates a print-friendly HTML report of all shows, highlighting new shows and showing add date."""
-    # Ensure docs directory exists
-    os.makedirs('docs', exist_ok=True)
-    
-    # Timezone conversion for display
-    utc_now = datetime.utcnow().replace(tzinfo=tz.UTC)
-    est_tz = tz.gettz(default_timezone)
-    est_now = utc_now.astimezone(est_tz)
-    generated_time_str = est_now.strftime("%Y-%m-%d %I:%M %p %Z")
+# The generation timestamp changes every run, so it is ignored when deciding whether to rewrite.
+GENERATED_ON_PATTERN = re.compile(r'Generated on: [^<]*')
 
-    html_template = '''
+REPORT_TEMPLATE = '''
     <!DOCTYPE html>
     <html lang="en">
     <head>
         <meta charset="UTF-8">
-        <title>Ruoff Music Center Shows</title>
+        <title>{venue_name} Shows</title>
         <style>
             body {{ font-family: 'Segoe UI', Arial, sans-serif; background: #f8f9fa; color: #222; margin: 0; padding: 0; }}
             .container {{ max-width: 900px; margin: 30px auto; background: #fff; border-radius: 10px; box-shadow: 0 2px 8px rgba(0,0,0,0.08); padding: 32px 40px 40px 40px; }}
@@ -43,7 +36,7 @@ def generate_html_report(shows_data, new_shows_set, show_add_times, default_time
     </head>
     <body>
         <div class="container">
-            <h1>Ruoff Music Center Shows</h1>
+            <h1>{venue_name} Shows</h1>
             <p class="footer">Generated on: {generated_time_str}</p>
             <table>
                 <thead>
@@ -65,54 +58,78 @@ def generate_html_report(shows_data, new_shows_set, show_add_times, default_time
     </body>
     </html>
     '''
-    
-    html_rows = []
-    if shows_data:
-        # Sort shows by parsed date
-        current_year = datetime.now().year
-        for show in shows_data:
-            show['parsed_date'] = parse_show_datetime(show['date_time_str'], current_year, default_timezone)
-        
-        # Filter out shows that couldn't be parsed before sorting
-        valid_shows = [s for s in shows_data if s['parsed_date']]
-        sorted_shows = sorted(valid_shows, key=lambda x: x['parsed_date'])
 
-        for show in sorted_shows:
-            show_key = f"{show['title']}|{show['date_time_str']}"
-            is_new = show_key in new_shows_set
-            new_show_class = ' class="new-show"' if is_new else ''
-            new_badge = ' <span class="badge badge-new">New!</span>' if is_new else ''
-            
-            # Format the parsed date for display
-            date_display = show['parsed_date'].strftime('%a, %b %d, %Y | %I:%M %p %Z')
-            
-            # Get and format the "added on" timestamp
-            added_on_str = ""
-            added_timestamp_iso = show_add_times.get(show_key)
-            if added_timestamp_iso:
-                try:
-                    # Parse the ISO format string and format it to a simple M/D/YYYY
-                    added_dt = dateutil_parser.isoparse(added_timestamp_iso)
-                    added_on_str = f"{added_dt.month}/{added_dt.day}/{added_dt.year}"
-                except (ValueError, TypeError):
-                    added_on_str = "N/A"
+# Built and split once at import time; each render only formats the small head and tail
+# around the streamed table rows.
+_REPORT_HEAD_TEMPLATE, _REPORT_TAIL_TEMPLATE = REPORT_TEMPLATE.split('{table_rows}')
+ROW_TEMPLATE = '<tr{row_class}><td>{date_display}</td><td>{title}{badge}</td><td style="font-size: 0.9em; color: #555;">{added_on}</td></tr>'
+NO_SHOWS_ROW = "<tr><td colspan='3'>No shows found.</td></tr>"
 
-            html_rows.append(f'<tr{new_show_class}><td>{date_display}</td><td>{show["title"]}{new_badge}</td><td style="font-size: 0.9em; color: #555;">{added_on_str}</td></tr>')
-    
-    table_rows_str = "\n".join(html_rows) if html_rows else "<tr><td colspan='3'>No shows found.</td></tr>"
 
-    html_content = html_template.format(
-        generated_time_str=generated_time_str,
-        table_rows=table_rows_str,
-        URL=url
-    )
+def _format_added_on(added_timestamp_iso):
+    """Formats an ISO "added on" timestamp as M/D/YYYY."""
+    if not added_timestamp_iso:
+        return ""
+    try:
+        added_dt = dateutil_parser.isoparse(added_timestamp_iso)
+        return f"{added_dt.month}/{added_dt.day}/{added_dt.year}"
+    except (ValueError, TypeError):
+        return "N/A"
+
+
+def render_html_report(shows_data, new_shows_set, show_add_times, generated_time_str, url, venue_name):
+    """Yields the report as a stream of HTML chunks: the head, one chunk per row, then the tail."""
+    yield _REPORT_HEAD_TEMPLATE.format(generated_time_str=generated_time_str, venue_name=html.escape(venue_name))
+
+    # Sort shows by parsed date, leaving out shows whose date couldn't be parsed
+    sorted_shows = sorted((s for s in shows_data if s.parsed_date), key=lambda x: x.parsed_date)
+    if not sorted_shows:
+        yield NO_SHOWS_ROW
+
+    for i, show in enumerate(sorted_shows):
+        is_new = show.key in new_shows_set
+        row = ROW_TEMPLATE.format(
+            row_class=' class="new-show"' if is_new else '',
+            date_display=show.parsed_date.strftime('%a, %b %d, %Y | %I:%M %p %Z'),
+            title=html.escape(show.title),
+            badge=' <span class="badge badge-new">New!</span>' if is_new else '',
+            added_on=_format_added_on(show_add_times.get(show.key))
+        )
+        yield row if i == 0 else "\n" + row
+
+    yield _REPORT_TAIL_TEMPLATE.format(generated_time_str=generated_time_str, URL=html.escape(url))
+
+
+def generate_html_report(shows_data, new_shows_set, show_add_times, default_timezone, url,
+                         venue_name="Ruoff Music Center", report_path=os.path.join('docs', 'index.html'),
+                         copy_path='ruoff_shows.html'):
+    """Generates a print-friendly HTML report of a list of Shows, highlighting new shows and showing add date.
+
+    Rows are streamed straight into the report file, which is only rewritten if more than
+    the generation timestamp changed. Gzip and Brotli copies are kept next to it, and
+    unless `copy_path` is None the report is mirrored there too.
+    """
+    # Ensure the report directory exists
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
     
+    # Timezone conversion for display
+    utc_now = datetime.utcnow().replace(tzinfo=tz.UTC)
+    est_tz = tz.gettz(default_timezone)
+    est_now = utc_now.astimezone(est_tz)
+    generated_time_str = est_now.strftime("%Y-%m-%d %I:%M %p %Z")
+
     # Save the report
-    report_path = os.path.join('docs', 'index.html')
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    
-    # Also save a copy to the root for easier access in some environments
-    shutil.copy(report_path, 'ruoff_shows.html')
+    changed = write_chunks_if_changed(
+        report_path,
+        lambda: render_html_report(shows_data or [], new_shows_set or set(), show_add_times,
+                                   generated_time_str, url, venue_name),
+        ignore_pattern=GENERATED_ON_PATTERN)
+    if changed:
+        print(f"Saved HTML report to {report_path}")
+    else:
+        print(f"HTML report {report_path} is unchanged.")
+    write_compressed_siblings(report_path, force=changed)
     
-    print(f"Saved HTML report to {report_path}") 
\ No newline at end of file
+    # Also keep a copy in the root for easier access in some environments
+    if copy_path:
+        mirror_file(report_path, copy_path)
@@ -0,0 +1,134 @@
+"""iCalendar (RFC 5545) feed of a venue's shows.
+
+The feed is published with the report on GitHub Pages, so anyone can subscribe to it
+without the Google Calendar API being involved. Its content depends only on the shows,
+not on when it was generated: UIDs come from the show's title and date and DTSTAMP from
+the time the show was first seen, so the file is only rewritten when the shows themselves
+change. A show that is the only one with its title on its day keeps its UID when its start
+time is added, dropped or moved, the same cases `show_identity.match_moved_keys` carries
+over; shows that share a day (a matinee and an evening show) get UIDs from their full keys.
+"""
+import hashlib
+import os
+import re
+from collections import Counter
+from datetime import timedelta
+
+from dateutil import parser as dateutil_parser
+from dateutil import tz
+
+from date_parser import has_time_of_day
+from output_writer import write_chunks_if_changed
+from show_identity import date_only_key
+
+PRODUCT_ID = "-//Ruoff Show Calendar//Live Nation Shows//EN"
+EVENT_DURATION = timedelta(hours=3)
+# How often subscribing clients are asked to poll the feed.
+REFRESH_INTERVAL = "PT12H"
+# RFC 5545 limits content lines to 75 octets, excluding the CRLF.
+MAX_LINE_OCTETS = 75
+TEXT_ESCAPE_PATTERN = re.compile(r'([\\;,])')
+
+
+def _escape_text(value):
+    """Escapes a TEXT property value."""
+    return TEXT_ESCAPE_PATTERN.sub(r'\\\1', value).replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold_line(line):
+    """Returns a content line folded to MAX_LINE_OCTETS octets, with CRLF line endings."""
+    if len(line.encode('utf-8')) <= MAX_LINE_OCTETS:
+        return line + "\r\n"
+    parts = []
+    current, current_octets, limit = [], 0, MAX_LINE_OCTETS
+    for char in line:
+        char_octets = len(char.encode('utf-8'))
+        if current_octets + char_octets > limit:
+            parts.append("".join(current))
+            # Continuation lines start with a space, which counts towards their length.
+            current, current_octets, limit = [], 0, MAX_LINE_OCTETS - 1
+        current.append(char)
+        current_octets += char_octets
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _utc_stamp(dt):
+    """Formats a datetime as an iCalendar UTC date-time; naive values are taken as local time."""
+    return dt.astimezone(tz.UTC).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_uid(show_key, venue_slug):
+    """Returns the stable UID for a show, derived from its key."""
+    return f"{hashlib.sha1(show_key.encode('utf-8')).hexdigest()}@{venue_slug}.shows"
+
+
+def render_ics_event(show, first_seen_iso, venue_slug, venue_name, url, uid_key=None):
+    """Returns the VEVENT block for a Show with a parsed date.
+
+    The UID is derived from `uid_key`, which defaults to the show key.
+    """
+    try:
+        stamp = _utc_stamp(dateutil_parser.isoparse(first_seen_iso)) if first_seen_iso else None
+    except (ValueError, TypeError):
+        stamp = None
+    # A listing without a clock time becomes an all-day event.
+    if has_time_of_day(show.date_time_str):
+        start = f"DTSTART:{_utc_stamp(show.parsed_date)}"
+        end = f"DTEND:{_utc_stamp(show.parsed_date + EVENT_DURATION)}"
+        stamp = stamp or _utc_stamp(show.parsed_date)
+    else:
+        start = f"DTSTART;VALUE=DATE:{show.parsed_date.strftime('%Y%m%d')}"
+        end = f"DTEND;VALUE=DATE:{(show.parsed_date + timedelta(days=1)).strftime('%Y%m%d')}"
+        stamp = stamp or show.parsed_date.strftime('%Y%m%dT000000Z')
+    description = f"Show: {show.title}\nSource: {url}"
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event_uid(uid_key or show.key, venue_slug)}",
+        f"DTSTAMP:{stamp}",
+        start,
+        end,
+        f"SUMMARY:{_escape_text(show.title)}",
+        f"LOCATION:{_escape_text(venue_name)}",
+        f"DESCRIPTION:{_escape_text(description)}",
+        f"URL:{url}",
+        "TRANSP:TRANSPARENT",
+        "END:VEVENT",
+    ]
+    return "".join(_fold_line(line) for line in lines)
+
+
+def render_ics_feed(shows_data, show_add_times, venue_slug, venue_name, url):
+    """Yields the feed as a stream of chunks: the calendar header, one VEVENT per show, then the footer."""
+    yield "".join(_fold_line(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODUCT_ID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape_text(f'{venue_name} Shows')}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}",
+        f"X-PUBLISHED-TTL:{REFRESH_INTERVAL}",
+    ])
+    # Shows whose date couldn't be parsed are left out.
+    shows = sorted((s for s in shows_data if s.parsed_date), key=lambda s: (s.parsed_date, s.key))
+    shows_per_day = Counter(date_only_key(show.key) for show in shows)
+    for show in shows:
+        day_key = date_only_key(show.key)
+        uid_key = day_key if shows_per_day[day_key] == 1 else show.key
+        yield render_ics_event(show, show_add_times.get(show.key), venue_slug, venue_name, url, uid_key)
+    yield _fold_line("END:VCALENDAR")
+
+
+def generate_ics_feed(shows_data, show_add_times, venue_slug, venue_name, url,
+                      feed_path=os.path.join('docs', 'shows.ics')):
+    """Streams the iCalendar feed for a list of Shows to `feed_path`, rewriting it only if it changed."""
+    os.makedirs(os.path.dirname(feed_path) or '.', exist_ok=True)
+    changed = write_chunks_if_changed(
+        feed_path, lambda: render_ics_feed(shows_data or [], show_add_times, venue_slug, venue_name, url))
+    if changed:
+        print(f"Saved calendar feed to {feed_path}")
+    else:
+        print(f"Calendar feed {feed_path} is unchanged.")
+    return changed
@@ -0,0 +1,95 @@
+"""Per-run stage timings and counters.
+
+Stages are timed with the `stage` context manager and counters are bumped with
+`increment`; both are safe to use from the scraper's worker threads. At the end of
+a run `write_metrics` saves everything as one JSON file per run, and warns about
+stages that got much slower than in the previous run.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_DIR = "metrics"
+LATEST_METRICS_FILE = "latest.json"
+# A stage is reported as slower when it takes this many times longer than last run...
+SLOWDOWN_FACTOR = 2.0
+# ...and at least this many seconds, so tiny stages don't cause noise.
+SLOWDOWN_MIN_SECONDS = 0.5
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+
+
+@contextmanager
+def stage(name):
+    """Times the enclosed block and adds it to the stage called `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name, seconds):
+    """Adds `seconds` of wall time to the stage called `name`."""
+    with _lock:
+        entry = _stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        entry['seconds'] += seconds
+        entry['calls'] += 1
+
+
+def increment(name, amount=1):
+    """Adds `amount` to the counter called `name`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def get_metrics():
+    """Returns a copy of the stages and counters recorded so far."""
+    with _lock:
+        return {
+            'stages': {name: dict(entry) for name, entry in _stages.items()},
+            'counters': dict(_counters),
+        }
+
+
+def reset():
+    """Clears all recorded stages and counters."""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def _warn_about_slowdowns(previous, current):
+    for name, entry in current['stages'].items():
+        previous_seconds = previous.get('stages', {}).get(name, {}).get('seconds')
+        if (previous_seconds and entry['seconds'] >= SLOWDOWN_MIN_SECONDS
+                and entry['seconds'] > previous_seconds * SLOWDOWN_FACTOR):
+            print(f"Warning: stage '{name}' took {entry['seconds']:.2f}s, up from {previous_seconds:.2f}s last run.")
+
+
+def write_metrics(metrics_dir=METRICS_DIR, started_at=None):
+    """Writes this run's metrics to `metrics_dir` as run-<timestamp>.json and latest.json.
+
+    Returns the path of the per-run file.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    started_at = started_at or datetime.now()
+    run_metrics = dict(get_metrics(), started_at=started_at.isoformat())
+
+    latest_path = os.path.join(metrics_dir, LATEST_METRICS_FILE)
+    try:
+        with open(latest_path, 'r', encoding='utf-8') as f:
+            _warn_about_slowdowns(json.load(f), run_metrics)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    run_path = os.path.join(metrics_dir, f"run-{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+    for path in (run_path, latest_path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(run_metrics, f, indent=4, sort_keys=True)
+    return run_path
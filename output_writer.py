@@ -0,0 +1,146 @@
+"""Change-aware, atomic writes for the generated artifacts.
+
+Outputs are rendered (in memory, or as a stream of chunks) and compared with what is
+already on disk by content hash, optionally ignoring volatile fields such as a
+"Generated on" timestamp. Only real changes are written, through a temporary file
+that is renamed into place, so a run with no changes does no disk writes and leaves
+nothing for git to commit.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import zlib
+
+import brotli
+
+READ_BLOCK_SIZE = 64 * 1024
+# Quality 11 shrinks the report only marginally further but is an order of magnitude slower.
+BROTLI_QUALITY = 9
+
+
+def _content_hash(chunks, ignore_pattern=None):
+    """Hashes an iterable of str or bytes chunks, blanking out matches of `ignore_pattern` in each."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        if ignore_pattern is not None:
+            chunk = ignore_pattern.sub('', chunk)
+        digest.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    return digest.digest()
+
+
+def _existing_hash(path, binary, ignore_pattern=None):
+    """Hashes the file at `path` line by line, or returns None if it can't be read."""
+    try:
+        if binary:
+            with open(path, 'rb') as f:
+                return _content_hash(f, ignore_pattern)
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return _content_hash(f, ignore_pattern)
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+
+
+def write_atomic(path, chunks, binary=False):
+    """Writes an iterable of str (or bytes) chunks to a temporary file next to `path` and renames it into place."""
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        if binary:
+            with os.fdopen(fd, 'wb') as f:
+                f.writelines(chunks)
+        else:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.writelines(chunks)
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        else:
+            os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def write_chunks_if_changed(path, render, ignore_pattern=None, binary=False):
+    """Streams content into `path` unless the file already holds the same content.
+
+    `render` is a callable returning an iterable of chunks. It is called once to hash
+    the new content and, only if that differs from the file, a second time to stream
+    it to disk, so large outputs are never held in memory. Matches of the compiled
+    `ignore_pattern` within a chunk (or a line of the existing file) are left out of
+    the comparison. Returns True if the file was written.
+    """
+    existing_hash = _existing_hash(path, binary, ignore_pattern)
+    if existing_hash is not None and existing_hash == _content_hash(render(), ignore_pattern):
+        return False
+    write_atomic(path, render(), binary)
+    return True
+
+
+def write_if_changed(path, content, ignore_pattern=None):
+    """Atomically writes str or bytes `content` to `path` unless the file already holds the same content.
+
+    Matches of the compiled `ignore_pattern` are left out of the comparison. Returns
+    True if the file was written.
+    """
+    return write_chunks_if_changed(path, lambda: [content], ignore_pattern, isinstance(content, bytes))
+
+
+def _read_blocks(path):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+
+def _gzip_chunks(path):
+    # wbits=31 writes a gzip container with a zero mtime and no file name, so the bytes are reproducible.
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    for block in _read_blocks(path):
+        yield compressor.compress(block)
+    yield compressor.flush()
+
+
+def _brotli_chunks(path):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for block in _read_blocks(path):
+        yield compressor.process(block)
+    yield compressor.finish()
+
+
+def write_compressed_siblings(path, force=False):
+    """Keeps precompressed `.gz` and `.br` copies next to `path`.
+
+    Siblings are streamed from the file and are only rebuilt when `force` is set or
+    they don't exist yet.
+    """
+    for suffix, encode in (('.gz', _gzip_chunks), ('.br', _brotli_chunks)):
+        sibling_path = path + suffix
+        if force or not os.path.exists(sibling_path):
+            write_atomic(sibling_path, encode(path), binary=True)
+
+
+def mirror_file(source_path, mirror_path):
+    """Makes `mirror_path` hold the same content as `source_path`.
+
+    Does nothing if it already does; otherwise hard-links it, falling back to an
+    atomic copy where links aren't supported. Returns True if the mirror changed.
+    """
+    if os.path.exists(mirror_path):
+        if os.path.samefile(source_path, mirror_path):
+            return False
+        if _existing_hash(source_path, True) == _existing_hash(mirror_path, True):
+            return False
+
+    temp_path = f"{mirror_path}.link.tmp"
+    try:
+        if os.path.lexists(temp_path):
+            os.unlink(temp_path)
+        os.link(source_path, temp_path)
+        os.replace(temp_path, mirror_path)
+    except OSError:
+        write_atomic(mirror_path, _read_blocks(source_path), binary=True)
+    return True
@@ -1,109 +1,368 @@
+import argparse
+import cProfile
+import os
+import random
+import time
 from datetime import datetime, timedelta
 
 import google_calendar_service
-from scraper import scrape_shows, filter_shows
+import metrics
+from scraper import MAX_FETCH_WORKERS, create_session, scrape_venues
+from snapshot_archive import SNAPSHOT_DIR
 from data_manager import (
     save_shows_to_csv, get_last_known_shows, save_current_shows_as_known,
-    load_show_add_times, save_show_add_times
+    load_show_add_times, load_show_add_time_labels, save_show_add_times, compute_shows_hash,
+    load_scrape_cache, save_scrape_cache, load_calendar_event_map, save_calendar_event_map,
+    load_archived_show_add_times, compact_show_add_times,
+    load_calendar_retry_queue, save_calendar_retry_queue
 )
 from html_generator import generate_html_report
-from date_parser import parse_show_datetime
-
-# --- Constants ---
-URL = "https://www.livenation.com/venue/KovZpvEk7A/ruoff-music-center-events"
-SHOWS_CSV_FILE = "ruoff_shows.csv"
-LAST_KNOWN_SHOWS_FILE = "last_known_shows.txt"
-SHOW_ADD_TIMES_FILE = "show_add_times.json"
-DEFAULT_EVENT_TIMEZONE = "America/New_York"
-
+from ics_generator import generate_ics_feed
+from date_parser import get_parse_stats
+from show_identity import match_moved_keys, rekey_event_map, rekey_timestamps
+from venues import VENUES, get_venues
+from state_store import (
+    STATE_DB_FILE, open_state_store, import_legacy_files, record_scrape, get_active_shows, get_first_seen_times
+)
 
-def compare_and_notify(current_shows_data, last_known_shows_file_path):
-    """Compares current shows with last known shows and prints new/removed shows."""
-    if not current_shows_data:
-        print("No current shows to compare.")
-        return
+# --watch polling, in seconds. The wait halves after a check that found changes and grows
+# by half while nothing changes, within the min/max bounds.
+WATCH_INITIAL_INTERVAL = 15 * 60
+WATCH_MIN_INTERVAL = 5 * 60
+WATCH_MAX_INTERVAL = 2 * 60 * 60
+WATCH_SPEEDUP_FACTOR = 0.5
+WATCH_SLOWDOWN_FACTOR = 1.5
+# Randomizes each wait by this fraction so checks don't fall into lockstep with anything upstream.
+WATCH_JITTER = 0.1
 
-    last_shows_set = get_last_known_shows(last_known_shows_file_path)
-    current_shows_set = {f"{show['title']}|{show['date_time_str']}" for show in current_shows_data}
 
-    new_shows = current_shows_set - last_shows_set
-    removed_shows = last_shows_set - current_shows_set
+def print_show_changes(new_shows, removed_shows, shows_data=(), removed_labels=None):
+    """Prints the new and removed `title|date` show keys, using the listed title and date where known.
 
+    Labels for new shows come from `shows_data`; `removed_labels` optionally maps removed
+    keys to their `(title, date_time_str)`.
+    """
+    labels = {show.key: f"{show.title} ({show.date_time_str})" for show in shows_data}
+    for show_key, (title, date_time) in (removed_labels or {}).items():
+        labels.setdefault(show_key, f"{title} ({date_time})")
     if new_shows:
         print("\n--- New Shows Added ---")
         for show_str in new_shows:
-            title, date_time = show_str.split('|', 1)
-            print(f"- {title} ({date_time})")
+            title, _, date_time = show_str.rpartition('|')
+            print(f"- {labels.get(show_str, f'{title} ({date_time})')}")
     
     if removed_shows:
         print("\n--- Shows Removed ---")
         for show_str in removed_shows:
-            title, date_time = show_str.split('|', 1)
-            print(f"- {title} ({date_time})")
+            title, _, date_time = show_str.rpartition('|')
+            print(f"- {labels.get(show_str, f'{title} ({date_time})')}")
 
     if not new_shows and not removed_shows:
         print("\nNo changes in shows since last check.")
 
+def compare_and_notify(current_shows_data, last_known_shows_file_path):
+    """Compares current shows with last known shows and prints new/removed shows."""
+    if not current_shows_data:
+        print("No current shows to compare.")
+        return
+
+    last_known_shows = get_last_known_shows(last_known_shows_file_path)
+    current_shows_set = {show.key for show in current_shows_data}
+    # A show that only changed its start time is neither new nor removed.
+    moved_keys = match_moved_keys(last_known_shows, current_shows_set)
+    last_shows_set = {moved_keys.get(key, key) for key in last_known_shows}
+
+    new_shows = current_shows_set - last_shows_set
+    removed_shows = last_shows_set - current_shows_set
+    print_show_changes(new_shows, removed_shows, current_shows_data, last_known_shows)
+
     return new_shows
 
-def main():
-    """Main function to orchestrate the scraping and processing."""
-    print(f"Scraping shows from {URL}...")
-    scraped_shows = scrape_shows(URL)
-    
-    if not scraped_shows:
-        print("Failed to scrape shows. Exiting.")
-        return
+def process_venue_outputs(venue, scraped_shows, state_conn=None):
+    """Writes the CSV, text, JSON, HTML and iCalendar outputs for one venue's freshly scraped shows.
 
-    scraped_shows = filter_shows(scraped_shows)
-    
-    print("\n--- All Scraped Shows ---")
+    With a SQLite `state_conn` the diff and first-seen times come from the state store,
+    and the CSV and text files are exported from it instead of the JSON file being kept.
+    """
+    print(f"\n--- All Scraped Shows: {venue['name']} ---")
     for i, show in enumerate(scraped_shows, 1):
-        print(f"{i}. {show['title']} - {show['date_time_str']}")
-    
-    save_shows_to_csv(scraped_shows, SHOWS_CSV_FILE)
+        print(f"{i}. {show.title} - {show.date_time_str}")
 
-    # --- Comparison and Notification ---
-    new_shows_set = compare_and_notify(scraped_shows, LAST_KNOWN_SHOWS_FILE)
-    save_current_shows_as_known(scraped_shows, LAST_KNOWN_SHOWS_FILE)
-    
-    # --- Add Times Persistence ---
-    show_add_times = load_show_add_times(SHOW_ADD_TIMES_FILE)
     now_iso = datetime.now().isoformat()
-    current_shows_set = {f"{show['title']}|{show['date_time_str']}" for show in scraped_shows}
-    for show_key in current_shows_set:
-        if show_key not in show_add_times:
-            show_add_times[show_key] = now_iso
-    save_show_add_times(show_add_times, SHOW_ADD_TIMES_FILE)
+    if state_conn:
+        import_legacy_files(state_conn, venue['slug'], venue['last_known_shows_file'],
+                            venue['show_add_times_file'], now_iso)
+        new_shows_set, removed_shows = record_scrape(state_conn, venue['slug'], scraped_shows, now_iso)
+        print_show_changes(new_shows_set, removed_shows, scraped_shows, removed_shows)
+        show_add_times = get_first_seen_times(state_conn, venue['slug'])
+        active_shows = get_active_shows(state_conn, venue['slug'])
+        save_shows_to_csv(active_shows, venue['shows_csv_file'])
+        save_current_shows_as_known(active_shows, venue['last_known_shows_file'])
+    else:
+        save_shows_to_csv(scraped_shows, venue['shows_csv_file'])
+
+        # --- Comparison and Notification ---
+        new_shows_set = compare_and_notify(scraped_shows, venue['last_known_shows_file'])
+        save_current_shows_as_known(scraped_shows, venue['last_known_shows_file'])
+        
+        # --- Add Times Persistence ---
+        current_keys = {show.key for show in scraped_shows}
+        add_time_labels = load_show_add_time_labels(venue['show_add_times_file'])
+        add_time_labels.update((show.key, (show.title, show.date_time_str)) for show in scraped_shows)
+        show_add_times = load_show_add_times(venue['show_add_times_file'])
+        show_add_times = rekey_timestamps(show_add_times, match_moved_keys(show_add_times, current_keys))
+        unknown_shows = [show for show in scraped_shows if show.key not in show_add_times]
+        if unknown_shows:
+            # A show that was delisted and came back keeps its original add time.
+            archived_add_times = load_archived_show_add_times(venue['show_add_times_archive_file'])
+            archived_add_times = rekey_timestamps(
+                archived_add_times, match_moved_keys(archived_add_times, [show.key for show in unknown_shows]))
+            for show in unknown_shows:
+                show_add_times[show.key] = archived_add_times.get(show.key, now_iso)
+        show_add_times = compact_show_add_times(show_add_times, current_keys, venue['show_add_times_archive_file'],
+                                                labels=add_time_labels)
+        save_show_add_times(show_add_times, venue['show_add_times_file'], add_time_labels)
 
     # --- Generate HTML Report ---
-    generate_html_report(scraped_shows, new_shows_set, show_add_times, DEFAULT_EVENT_TIMEZONE, URL)
+    with metrics.stage('html_report'):
+        generate_html_report(scraped_shows, new_shows_set, show_add_times, venue['timezone'], venue['url'],
+                             venue_name=venue['name'], report_path=venue['report_file'],
+                             copy_path=venue['report_copy_file'])
+    with metrics.stage('ics_feed'):
+        generate_ics_feed(scraped_shows, show_add_times, venue['slug'], venue['name'], venue['url'],
+                          feed_path=venue['ics_file'])
 
-    # --- Google Calendar Integration ---
-    print("\n--- Processing for Google Calendar ---")
-    cal_service = google_calendar_service.get_calendar_service()
-    if not cal_service:
-        print("Failed to obtain Google Calendar service. Calendar operations skipped.")
-        return
+def sync_venue_calendar(venue, scraped_shows, get_cal_service):
+    """Syncs one venue's shows to its Google Calendar, sending only the changed events.
 
-    print("Successfully obtained Google Calendar service.")
-    current_year = datetime.now().year
+    Operations that still fail after the in-run retries are saved to the venue's retry
+    queue. Returns False if the calendar could not be reached at all.
+    """
+    print(f"\n--- Processing for Google Calendar: {venue['name']} ---")
+    desired_events = {}
     for show in scraped_shows:
-        start_datetime_obj = parse_show_datetime(show['date_time_str'], current_year, DEFAULT_EVENT_TIMEZONE)
-        
-        if start_datetime_obj:
-            print(f"Processing for calendar: {show['title']} at {start_datetime_obj.strftime('%Y-%m-%d %I:%M %p %Z')}")
-            google_calendar_service.add_event_to_calendar(
-                service=cal_service,
-                summary=show['title'],
-                start_datetime=start_datetime_obj,
-                end_datetime=start_datetime_obj + timedelta(hours=3),
-                description=f"Show: {show['title']}\nSource: {URL}\nScraped: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                timezone=DEFAULT_EVENT_TIMEZONE
-            )
+        if show.parsed_date:
+            desired_events[show.key] = google_calendar_service.build_show_event_body(
+                show, venue['url'], timezone=venue['timezone'])
+        else:
+            print(f"Could not parse date/time for '{show.title}' ({show.date_time_str}). Skipping calendar add.")
+
+    event_map = load_calendar_event_map(venue['calendar_event_map_file'])
+    # A rescheduled show keeps its event, which is then patched to the new time.
+    event_map = rekey_event_map(event_map, match_moved_keys(event_map, desired_events))
+    failed = google_calendar_service.sync_calendar_events(
+        get_cal_service, desired_events, event_map, calendar_id=venue['calendar_id'])
+    save_calendar_event_map(event_map, venue['calendar_event_map_file'])
+    if failed is None:
+        return False
+    # A full sync recomputes every pending change, so it replaces whatever was queued before.
+    save_calendar_retry_queue(failed, venue['calendar_retry_queue_file'])
+    return True
+
+def retry_venue_calendar_queue(venue):
+    """Replays the calendar operations queued by earlier runs of an unchanged venue."""
+    queued = load_calendar_retry_queue(venue['calendar_retry_queue_file'])
+    if not queued:
+        return
+    print(f"{venue['name']}: retrying {len(queued)} queued calendar operation(s).")
+    event_map = load_calendar_event_map(venue['calendar_event_map_file'])
+    failed = google_calendar_service.apply_calendar_operations(queued, event_map, calendar_id=venue['calendar_id'])
+    save_calendar_event_map(event_map, venue['calendar_event_map_file'])
+    save_calendar_retry_queue(failed, venue['calendar_retry_queue_file'])
+
+def calendar_service_getter():
+    """Returns a callable that builds the Calendar service the first time a venue actually needs it.
+
+    A failed build is not remembered, so a watcher tries to authenticate again on its next check.
+    """
+    cal_services = []
+    def get_cal_service():
+        if not cal_services:
+            with metrics.stage('calendar_auth'):
+                service = google_calendar_service.get_calendar_service()
+            if service is None:
+                return None
+            cal_services.append(service)
+        return cal_services[0]
+    return get_cal_service
+
+def process_venues(venues, http_caches, get_cal_service, state_conn=None, session=None, snapshot_dir=None):
+    """Fetches every venue once and processes the ones whose shows changed.
+
+    Fetched pages are archived in `snapshot_dir` if given. Returns the list of venues
+    whose shows changed.
+    """
+    with metrics.stage('fetch_and_extract'):
+        scraped_by_venue = scrape_venues(venues, http_caches, session=session, snapshot_dir=snapshot_dir)
+
+    changed_venues = []
+    unchanged_venues = []
+    for venue in venues:
+        http_cache = http_caches[venue['slug']]
+        scraped_shows = scraped_by_venue[venue['slug']]
+
+        if http_cache.pop('not_modified', False):
+            print(f"{venue['name']}: page not modified since last run. Nothing to do.")
+            unchanged_venues.append(venue)
+            continue
+
+        if not scraped_shows:
+            print(f"{venue['name']}: failed to scrape shows. Skipping.")
+            continue
+
+        shows_hash = compute_shows_hash(scraped_shows)
+        if shows_hash == http_cache.get('events_hash'):
+            print(f"{venue['name']}: shows unchanged since last run. Skipping outputs and calendar sync.")
+            save_scrape_cache(http_cache, venue['scrape_cache_file'])
+            unchanged_venues.append(venue)
+            continue
+
+        with metrics.stage(f"outputs:{venue['slug']}"):
+            process_venue_outputs(venue, scraped_shows, state_conn)
+        http_cache['events_hash'] = shows_hash
+        changed_venues.append(venue)
+
+    # --- Google Calendar Integration ---
+    for venue in changed_venues:
+        with metrics.stage(f"calendar_sync:{venue['slug']}"):
+            in_sync = sync_venue_calendar(venue, scraped_by_venue[venue['slug']], get_cal_service)
+        if in_sync:
+            # Only record the new state once every stage has run, so a failed run is retried in full.
+            # Individual operations that failed are left to the retry queue instead.
+            save_scrape_cache(http_caches[venue['slug']], venue['scrape_cache_file'])
         else:
-            print(f"Could not parse date/time for '{show['title']}' ({show['date_time_str']}). Skipping calendar add.")
+            # Go back to the last complete state, so a long-running watcher retries the venue too.
+            http_caches[venue['slug']] = load_scrape_cache(venue['scrape_cache_file'])
+
+    for venue in unchanged_venues:
+        with metrics.stage(f"calendar_retry:{venue['slug']}"):
+            retry_venue_calendar_queue(venue)
+
+    return changed_venues
+
+def record_run_metrics(metrics_dir, started_at, previous_parse_stats=None):
+    """Adds the date-parser counters (since `previous_parse_stats`) and writes the run metrics.
+
+    Returns the cumulative parse stats, to pass in as `previous_parse_stats` next time.
+    """
+    parse_stats = get_parse_stats()
+    run_stats = {name: count - (previous_parse_stats or {}).get(name, 0) for name, count in parse_stats.items()}
+    print(f"\nDate parsing: {run_stats['fast_path']} fast path, {run_stats['fallback']} dateutil fallback, "
+          f"{run_stats['failed']} failed, {run_stats['cache_hits']} cache hits.")
+    for name, count in run_stats.items():
+        metrics.increment(f"date_parse_{name}", count)
+    print(f"Run metrics written to {metrics.write_metrics(metrics_dir, started_at)}")
+    return parse_stats
+
+def main(force=False, venue_slugs=None, state_db=None, metrics_dir=metrics.METRICS_DIR, snapshot_dir=SNAPSHOT_DIR):
+    """Main function to orchestrate the scraping and processing.
+
+    All selected venues are fetched concurrently over one pooled session, then each
+    venue's outputs and calendar are processed in turn. Unless `force` is set, a venue
+    is skipped right after the fetch when its page is unchanged (HTTP 304) or yields
+    exactly the same shows as its last complete run. If `state_db` is given, show state
+    is kept in that SQLite database instead of the text and JSON files. Raw pages are
+    archived in `snapshot_dir` unless it is None. Stage timings and counters are
+    written to `metrics_dir` at the end of the run.
+    """
+    started_at = datetime.now()
+    venues = get_venues(venue_slugs)
+    http_caches = {venue['slug']: {} if force else load_scrape_cache(venue['scrape_cache_file'])
+                   for venue in venues}
+    state_conn = open_state_store(state_db) if state_db else None
+
+    process_venues(venues, http_caches, calendar_service_getter(), state_conn, snapshot_dir=snapshot_dir)
+
+    if state_conn:
+        state_conn.close()
+    record_run_metrics(metrics_dir, started_at)
+
+def watch(force=False, venue_slugs=None, state_db=None, metrics_dir=metrics.METRICS_DIR,
+          min_interval=WATCH_MIN_INTERVAL, max_interval=WATCH_MAX_INTERVAL, snapshot_dir=SNAPSHOT_DIR):
+    """Keeps checking the venues from one long-running process until interrupted.
+
+    The HTTP session, the response caches, the state store and the Calendar service
+    stay warm between checks, so each check is just a conditional fetch and a diff.
+    The wait between checks shrinks after a check that found changes and grows while
+    the pages stay the same, within `min_interval` and `max_interval` seconds. Metrics
+    are only written for checks that changed something.
+    """
+    venues = get_venues(venue_slugs)
+    http_caches = {venue['slug']: {} if force else load_scrape_cache(venue['scrape_cache_file'])
+                   for venue in venues}
+    state_conn = open_state_store(state_db) if state_db else None
+    get_cal_service = calendar_service_getter()
+    interval = min(max(WATCH_INITIAL_INTERVAL, min_interval), max_interval)
+    parse_stats = get_parse_stats()
+    print(f"Watching {len(venues)} venue(s), checking every {min_interval:.0f}-{max_interval:.0f}s. "
+          "Press Ctrl+C to stop.")
+    try:
+        with create_session(min(MAX_FETCH_WORKERS, len(venues))) as session:
+            while True:
+                started_at = datetime.now()
+                metrics.reset()
+                try:
+                    changed_venues = process_venues(venues, http_caches, get_cal_service, state_conn, session,
+                                                    snapshot_dir)
+                except Exception as e:
+                    # One failed check shouldn't stop the watcher; back off as if nothing changed.
+                    print(f"Check failed: {e}")
+                    changed_venues = []
+
+                if changed_venues:
+                    parse_stats = record_run_metrics(metrics_dir, started_at, parse_stats)
+                    interval = max(min_interval, interval * WATCH_SPEEDUP_FACTOR)
+                else:
+                    interval = min(max_interval, interval * WATCH_SLOWDOWN_FACTOR)
+                wait_seconds = interval * random.uniform(1 - WATCH_JITTER, 1 + WATCH_JITTER)
+                next_check = datetime.now() + timedelta(seconds=wait_seconds)
+                print(f"Next check in {wait_seconds:.0f}s, at {next_check.strftime('%H:%M:%S')}.")
+                time.sleep(wait_seconds)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        if state_conn:
+            state_conn.close()
 
 if __name__ == "__main__":
-    main()
-    print(f"\nFinished script at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}") 
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Scrape Live Nation venue shows and sync them.")
+    arg_parser.add_argument('--force', action='store_true',
+                            help="Ignore the response cache and run the full pipeline.")
+    arg_parser.add_argument('--venue', action='append', dest='venues',
+                            choices=[venue['slug'] for venue in VENUES],
+                            help="Only process this venue (repeatable). Defaults to every registered venue.")
+    arg_parser.add_argument('--state-db', nargs='?', const=STATE_DB_FILE, metavar='PATH',
+                            help=f"Keep show state in a SQLite database (default path: {STATE_DB_FILE}).")
+    arg_parser.add_argument('--metrics-dir', default=metrics.METRICS_DIR,
+                            help=f"Directory for the per-run metrics JSON (default: {metrics.METRICS_DIR}).")
+    arg_parser.add_argument('--profile', action='store_true',
+                            help="Also save a cProfile dump of the run to the metrics directory.")
+    arg_parser.add_argument('--watch', action='store_true',
+                            help="Keep running and re-check the venues with an adaptive interval.")
+    arg_parser.add_argument('--min-interval', type=float, default=WATCH_MIN_INTERVAL, metavar='SECONDS',
+                            help=f"Shortest wait between --watch checks (default: {WATCH_MIN_INTERVAL}).")
+    arg_parser.add_argument('--max-interval', type=float, default=WATCH_MAX_INTERVAL, metavar='SECONDS',
+                            help=f"Longest wait between --watch checks (default: {WATCH_MAX_INTERVAL}).")
+    arg_parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR,
+                            help=f"Directory for the archive of raw fetched pages (default: {SNAPSHOT_DIR}).")
+    arg_parser.add_argument('--no-snapshots', action='store_true',
+                            help="Don't archive the raw fetched pages.")
+    args = arg_parser.parse_args()
+    snapshot_dir = None if args.no_snapshots else args.snapshot_dir
+    if args.min_interval <= 0 or args.max_interval < args.min_interval:
+        arg_parser.error("--min-interval must be positive and no greater than --max-interval")
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    if args.watch:
+        watch(force=args.force, venue_slugs=args.venues, state_db=args.state_db, metrics_dir=args.metrics_dir,
+              min_interval=args.min_interval, max_interval=args.max_interval, snapshot_dir=snapshot_dir)
+    else:
+        main(force=args.force, venue_slugs=args.venues, state_db=args.state_db, metrics_dir=args.metrics_dir,
+             snapshot_dir=snapshot_dir)
+    if profiler:
+        profiler.disable()
+        profile_path = os.path.join(args.metrics_dir, f"profile-{datetime.now().strftime('%Y%m%dT%H%M%S')}.prof")
+        profiler.dump_stats(profile_path)
+        print(f"Profile written to {profile_path}")
+    print(f"\nFinished script at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -1,61 +1,188 @@
+import codecs
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+import re
+
+import metrics
+from show import Show, DEFAULT_EVENT_TIMEZONE
+from snapshot_archive import SnapshotWriter
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+STREAM_CHUNK_SIZE = 64 * 1024
+# Longest unmatched tail carried between chunks. A key split across a chunk boundary
+# (or a value still waiting for its closing quote) always fits well inside this.
+MAX_CARRY_CHARS = 4096
+MAX_FETCH_WORKERS = 4
+
+
+class IncompleteDownloadError(Exception):
+    """Raised when a page body breaks off partway, so the shows read so far are not the whole listing."""
+
+# LiveNation now embeds event data as escaped JSON within streaming script tags.
+# A single alternation lets us walk the payload once, in document order, instead of
+# re-scanning a lookback window for every date we find.
+EVENT_FIELD_PATTERN = re.compile(r'\\"(name|venue_name|start_date_local)\\":\\"(.*?)\\"')
+
+
+def iter_extract_shows(chunks, venue_match="Ruoff", timezone=DEFAULT_EVENT_TIMEZONE):
+    """Yields Shows from an iterable of page text chunks in a single forward pass.
+
+    The most recent `name` and `venue_name` seen so far are tracked as the page is
+    scanned; every `start_date_local` emits a record using them, so the cost is linear
+    in the page size regardless of how far back the name and venue appear. Text after
+    the last complete match is carried into the next chunk, so keys split across chunk
+    boundaries are still found.
+    """
+    name = None
+    venue = None
+    buffer = ""
+
+    for chunk in chunks:
+        buffer += chunk
+        consumed = 0
+        for m in EVENT_FIELD_PATTERN.finditer(buffer):
+            consumed = m.end()
+            field, value = m.group(1), m.group(2)
+            if field == "name":
+                name = value
+            elif field == "venue_name":
+                venue = value
+            elif name is not None and venue_match in (venue or "Unknown"):
+                # Clean up name if it contains escaped characters.
+                yield Show.from_scrape(name.replace('\\"', '"').replace("\\'", "'"), value, timezone)
+        buffer = buffer[consumed:][-MAX_CARRY_CHARS:]
+
+
+def extract_shows(content, venue_match="Ruoff", timezone=DEFAULT_EVENT_TIMEZONE):
+    """Extracts Shows from a fully downloaded Live Nation page."""
+    return list(iter_extract_shows([content], venue_match, timezone))
+
+
+def create_session(pool_size=MAX_FETCH_WORKERS):
+    """Creates a keep-alive HTTP session whose connection pool fits `pool_size` workers."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def stream_shows(url, venue_match="Ruoff", chunk_size=STREAM_CHUNK_SIZE, http_cache=None, session=None,
+                 timezone=DEFAULT_EVENT_TIMEZONE, snapshot_dir=None, venue_slug=None):
+    """Yields shows while the Live Nation page is still downloading.
+
+    The response body is read with `iter_content` and decoded incrementally, so parsing
+    overlaps the transfer and the full page is never held in memory.
+
+    If `http_cache` is given, the validators it holds from a previous complete run are
+    sent as a conditional request. On a 304 `http_cache['not_modified']` is set and
+    nothing is yielded; otherwise the new ETag/Last-Modified values are stored in it
+    once the body has been read in full. If the body breaks off partway,
+    IncompleteDownloadError is raised after the shows read so far.
+    Passing a `session` reuses its pooled keep-alive connections. With a `snapshot_dir`,
+    the raw body is also teed into the page archive (see `snapshot_archive`) under
+    `venue_slug`.
+    """
+    headers = dict(HEADERS)
+    if http_cache and http_cache.get('events_hash'):
+        if http_cache.get('etag'):
+            headers['If-None-Match'] = http_cache['etag']
+        if http_cache.get('last_modified'):
+            headers['If-Modified-Since'] = http_cache['last_modified']
 
-def scrape_shows(url):
-    """Scrapes show information from the Live Nation website."""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
+        response = (session or requests).get(url, headers=headers, timeout=30, stream=True)
         response.raise_for_status()  # Raise an exception for bad status codes
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
-        return None
+        return
 
-import re
+    if response.status_code == 304:
+        response.close()
+        metrics.increment('http_not_modified')
+        http_cache['not_modified'] = True
+        return
+
+    found = 0
+    snapshot = SnapshotWriter(snapshot_dir, venue_slug, url) if snapshot_dir else None
+    with response:
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        def text_chunks():
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                metrics.increment('bytes_downloaded', len(chunk))
+                if snapshot:
+                    snapshot.write(chunk)
+                yield decoder.decode(chunk)
+
+        try:
+            for show in iter_extract_shows(text_chunks(), venue_match, timezone):
+                found += 1
+                yield show
+        except requests.exceptions.RequestException as e:
+            if snapshot:
+                snapshot.discard()
+            raise IncompleteDownloadError(f"Error reading response from {url}: {e}") from e
+        except BaseException:
+            if snapshot:
+                snapshot.discard()
+            raise
+
+    if http_cache is not None:
+        http_cache['etag'] = response.headers.get('ETag')
+        http_cache['last_modified'] = response.headers.get('Last-Modified')
+    if snapshot:
+        snapshot.commit(found)
+
+    metrics.increment('events_extracted', found)
+    if not found:
+        print("No shows found. The website structure might have changed significantly.")
+
+def scrape_venues(venues, http_caches, max_workers=MAX_FETCH_WORKERS, session=None, snapshot_dir=None):
+    """Fetches and extracts several venues concurrently over one pooled session.
+
+    `http_caches` maps each venue slug to the cache dict passed to `stream_shows`. A
+    long-lived `session` can be passed in to keep its connections warm between calls;
+    otherwise one is created and closed here. Fetched pages are archived in
+    `snapshot_dir` if given. Returns a dict mapping each venue slug to its filtered
+    list of shows, which is empty if the download failed or broke off partway.
+    """
+    workers = max(1, min(max_workers, len(venues)))
+    if session is None:
+        with create_session(workers) as session:
+            return scrape_venues(venues, http_caches, max_workers, session, snapshot_dir)
+
+    def fetch(venue):
+        print(f"Scraping {venue['name']} shows from {venue['url']}...")
+        with metrics.stage(f"fetch:{venue['slug']}"):
+            try:
+                return filter_shows(stream_shows(venue['url'], venue['venue_match'],
+                                                 http_cache=http_caches[venue['slug']], session=session,
+                                                 timezone=venue['timezone'], snapshot_dir=snapshot_dir,
+                                                 venue_slug=venue['slug']))
+            except IncompleteDownloadError as e:
+                # A partial listing would look like mass removals; treat the venue as not scraped.
+                print(e)
+                metrics.increment('incomplete_downloads')
+                return []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(fetch, venues)
+        return {venue['slug']: shows for venue, shows in zip(venues, results)}
 
 def scrape_shows(url):
     """Scrapes show information from the Live Nation website."""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
+        response = requests.get(url, headers=HEADERS, timeout=30)
         response.raise_for_status()  # Raise an exception for bad status codes
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
         return None
 
-    content = response.text
-    shows_data = []
-
-    # LiveNation now embeds event data as escaped JSON within streaming script tags.
-    # We use regex to extract the show name and date, filtering for Ruoff Music Center.
-    name_pattern = r'\\"name\\":\\"(.*?)\\"'
-    date_pattern = r'\\"start_date_local\\":\\"(.*?)\\"'
-    venue_pattern = r'\\"venue_name\\":\\"(.*?)\\"'
-
-    # Find all occurrences of start_date_local and look back for name and venue.
-    for m in re.finditer(date_pattern, content):
-        start = m.start()
-        # Look back 1000 characters for the corresponding name and venue keys.
-        lookback = content[max(0, start-1000):start]
-        name_match = re.findall(name_pattern, lookback)
-        venue_match = re.findall(venue_pattern, lookback)
-
-        if name_match:
-            name = name_match[-1] # The most recent name before the date is the show name.
-            date_str = m.group(1)
-            venue = venue_match[-1] if venue_match else "Unknown"
-
-            if "Ruoff" in venue:
-                # Clean up name if it contains escaped characters.
-                name = name.replace('\\"', '"').replace("\\'", "'")
-                shows_data.append({
-                    "title": name,
-                    "date_time_str": date_str
-                })
+    shows_data = extract_shows(response.text)
 
     if not shows_data:
         print("No shows found. The website structure might have changed significantly.")
@@ -64,4 +191,4 @@ def scrape_shows(url):
 
 def filter_shows(shows_data):
     """Omit shows with the title '2025 Premium Season Ticket Priority List' (case-insensitive, ignore spaces)."""
-    return [show for show in shows_data if show['title'].strip().lower() != '2025 premium season ticket priority list'] 
\ No newline at end of file
+    return [show for show in shows_data if show.title.strip().lower() != '2025 premium season ticket priority list'] 
@@ -0,0 +1,30 @@
+"""The Show record that flows from the scraper through every later stage."""
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from date_parser import parse_show_datetime
+from show_identity import canonical_show_key
+
+DEFAULT_EVENT_TIMEZONE = "America/New_York"
+
+
+def make_show_key(title, date_time_str, parsed_date=None):
+    """Returns the canonical `title|YYYY-MM-DD[THH:MM]` key used in the state files and diffs."""
+    return canonical_show_key(title, date_time_str, parsed_date)
+
+
+@dataclass(frozen=True, slots=True)
+class Show:
+    """A scraped show. The parsed date and canonical key are computed once, at scrape time."""
+    title: str
+    date_time_str: str
+    parsed_date: datetime = None
+    key: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'key', make_show_key(self.title, self.date_time_str, self.parsed_date))
+
+    @classmethod
+    def from_scrape(cls, title, date_time_str, timezone=DEFAULT_EVENT_TIMEZONE):
+        """Builds a Show from raw scraped strings, parsing the date in `timezone`."""
+        return cls(title, date_time_str, parse_show_datetime(date_time_str, datetime.now().year, timezone))
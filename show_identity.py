@@ -0,0 +1,150 @@
+"""Canonical show identity.
+
+Live Nation has changed how it formats listings more than once ("Sat Aug 16, 2025 ▪︎ 7PM"
+became "2026-08-23", and titles arrive with `\\u0026`-style escapes that are sometimes
+decoded and sometimes not). Keying state on the raw strings made every such change look
+like a full turnover of shows. The canonical key is the normalized title plus the show's
+calendar date, and its start time when the listing gives one, so it stays the same
+across those format changes while a matinee and an evening show stay apart.
+
+State written before canonical keys existed is rekeyed when it is loaded; entries whose
+old keys collapse onto the same canonical key are merged, keeping the earliest timestamp.
+When the listing starts or stops giving times, or a show moves to another time on the
+same day, `match_moved_keys` carries the stored state over to the show's new key.
+"""
+import html
+import re
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+
+from date_parser import has_time_of_day, parse_show_datetime
+
+# Any timezone gives the same calendar date and wall-clock time; it only has to be a valid one.
+KEY_TIMEZONE = "America/New_York"
+KEY_CACHE_SIZE = 8192
+UNICODE_ESCAPE_PATTERN = re.compile(r'\\u([0-9a-fA-F]{4})')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def _decode_unicode_escape(match):
+    return chr(int(match.group(1), 16))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def normalize_title(title):
+    """Returns the comparison form of a show title: escapes decoded, NFKC, casefolded, single-spaced."""
+    title = UNICODE_ESCAPE_PATTERN.sub(_decode_unicode_escape, title)
+    # Rejoin any escaped surrogate pairs (emoji and other astral characters).
+    title = title.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+    title = unicodedata.normalize('NFKC', html.unescape(title)).casefold()
+    return WHITESPACE_PATTERN.sub(' ', title).strip()
+
+
+def canonical_date(date_time_str, parsed_date=None):
+    """Returns the show's date as YYYY-MM-DD (YYYY-MM-DDTHH:MM if the listing gives a time).
+
+    Dates that can't be parsed are returned as their normalized raw text.
+    """
+    if parsed_date is None:
+        parsed_date = parse_show_datetime(date_time_str, datetime.now().year, KEY_TIMEZONE)
+    if parsed_date is None:
+        return WHITESPACE_PATTERN.sub(' ', date_time_str).strip().casefold()
+    if has_time_of_day(date_time_str):
+        return parsed_date.strftime('%Y-%m-%dT%H:%M')
+    return parsed_date.strftime('%Y-%m-%d')
+
+
+def canonical_show_key(title, date_time_str, parsed_date=None):
+    """Returns the canonical `title|YYYY-MM-DD[THH:MM]` key for a show."""
+    return f"{normalize_title(title)}|{canonical_date(date_time_str, parsed_date)}"
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def canonical_key_for(show_key):
+    """Maps a stored show key, raw `title|date_time_str` or already canonical, to its canonical key."""
+    title, separator, date_time_str = show_key.rpartition('|')
+    if not separator:
+        return show_key
+    return canonical_show_key(title, date_time_str)
+
+
+def index_show_labels(show_keys):
+    """Returns canonical key -> `(title, date_time_str)` for stored `title|date_time_str` keys.
+
+    The title and date are kept exactly as stored. When several keys share a canonical
+    key, the first one wins.
+    """
+    labels = {}
+    for show_key in show_keys:
+        title, separator, date_time_str = show_key.rpartition('|')
+        if separator:
+            labels.setdefault(canonical_key_for(show_key), (title, date_time_str))
+    return labels
+
+
+def build_key_index(show_keys):
+    """Returns an old-key -> canonical-key index for the keys that are not canonical yet."""
+    index = {}
+    for show_key in show_keys:
+        canonical_key = canonical_key_for(show_key)
+        if canonical_key != show_key:
+            index[show_key] = canonical_key
+    return index
+
+
+def date_only_key(show_key):
+    """Returns a canonical key without its start time."""
+    title, _, show_date = show_key.rpartition('|')
+    return f"{title}|{show_date.partition('T')[0]}"
+
+
+def match_moved_keys(stored_keys, current_keys):
+    """Returns a stored-key -> current-key index for shows that only changed their start time.
+
+    A stored key that is no longer current is matched to a new current key with the same
+    title and date, as long as each is the only unmatched key on that day. This covers the
+    listing adding or dropping times as well as a show being rescheduled within the day.
+    """
+    current_keys = set(current_keys)
+    stored_keys = set(stored_keys)
+    candidates = {}
+    for show_key in stored_keys - current_keys:
+        candidates.setdefault(date_only_key(show_key), ([], []))[0].append(show_key)
+    for show_key in current_keys - stored_keys:
+        if (group := candidates.get(date_only_key(show_key))) is not None:
+            group[1].append(show_key)
+    return {old[0]: new[0] for old, new in candidates.values() if len(old) == 1 and len(new) == 1}
+
+
+def rekey_timestamps(timestamps, index=None):
+    """Rekeys a show-key -> ISO timestamp dict, keeping the earliest timestamp on collisions.
+
+    Keys are made canonical, or moved as given by `index` (old key -> new key).
+    """
+    if index is None:
+        index = build_key_index(timestamps)
+    if not index:
+        return timestamps
+    rekeyed = {}
+    for show_key, timestamp in timestamps.items():
+        canonical_key = index.get(show_key, show_key)
+        rekeyed[canonical_key] = min(timestamp, rekeyed.get(canonical_key, timestamp))
+    return rekeyed
+
+
+def rekey_event_map(event_map, index=None):
+    """Rekeys a show-key -> calendar event map, to canonical keys or as given by `index`.
+
+    When several old keys collapse onto one new key, the first event keeps it and the
+    others stay under their old keys, so the next sync removes them as duplicates.
+    """
+    if index is None:
+        index = build_key_index(event_map)
+    if not index:
+        return event_map
+    rekeyed = {key: entry for key, entry in event_map.items() if key not in index}
+    for show_key in sorted(index):
+        canonical_key = index[show_key]
+        rekeyed[show_key if canonical_key in rekeyed else canonical_key] = event_map[show_key]
+    return rekeyed
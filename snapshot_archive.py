@@ -0,0 +1,221 @@
+"""Content-addressed archive of the raw venue pages, with offline replay.
+
+Every page body the scraper downloads is compressed on the fly (zstd if `zstandard`
+is installed, gzip otherwise) into `snapshots/<sha256[:2]>/<sha256>.<ext>`, so a page
+that hasn't changed since an earlier fetch costs no extra space. Each fetch is
+recorded as one line of `snapshots/index.jsonl`.
+
+`python snapshot_archive.py replay` runs the current extractor over every archived
+page on a process pool, without network access. Use it to check a parser change
+against months of real pages, find fetches that yielded no shows, and rebuild
+first-seen times from the fetch history.
+
+Usage:
+    python snapshot_archive.py replay
+    python snapshot_archive.py replay --venue ruoff --workers 8 --merge-add-times
+"""
+import argparse
+import codecs
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from data_manager import merge_first_seen_times
+from show import Show
+from show_identity import match_moved_keys, rekey_timestamps
+from venues import get_venues
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; snapshots fall back to gzip.
+    zstandard = None
+
+SNAPSHOT_DIR = "snapshots"
+INDEX_FILE = "index.jsonl"
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+READ_BLOCK_SIZE = 64 * 1024
+
+_index_lock = threading.Lock()
+
+
+class SnapshotWriter:
+    """Compresses and hashes a page body as it streams in, then files it in the archive.
+
+    Call `write` with each raw chunk, then `commit` once the body has been read in full,
+    or `discard` if the download failed.
+    """
+
+    def __init__(self, snapshot_dir, venue_slug, url):
+        self.snapshot_dir = snapshot_dir
+        self.venue_slug = venue_slug
+        self.url = url
+        self.fetched_at = datetime.now().isoformat()
+        self.extension = 'zst' if zstandard else 'gz'
+        self._digest = hashlib.sha256()
+        self._size = 0
+        if zstandard:
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        fd, self._temp_path = tempfile.mkstemp(dir=snapshot_dir, prefix='.snapshot.', suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self._digest.update(chunk)
+        self._size += len(chunk)
+        self._file.write(self._compressor.compress(chunk))
+
+    def discard(self):
+        self._file.close()
+        os.unlink(self._temp_path)
+
+    def commit(self, events_found):
+        """Moves the blob into place (unless an identical page is already archived) and indexes the fetch."""
+        self._file.write(self._compressor.flush())
+        self._file.close()
+        content_hash = self._digest.hexdigest()
+        blob = os.path.join(content_hash[:2], f"{content_hash}.{self.extension}")
+        blob_path = os.path.join(self.snapshot_dir, blob)
+        if os.path.exists(blob_path):
+            os.unlink(self._temp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.chmod(self._temp_path, 0o644)
+            os.replace(self._temp_path, blob_path)
+
+        entry = {'fetched_at': self.fetched_at, 'venue': self.venue_slug, 'url': self.url,
+                 'sha256': content_hash, 'blob': blob, 'bytes': self._size, 'events': events_found}
+        with _index_lock, open(os.path.join(self.snapshot_dir, INDEX_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+
+def load_index(snapshot_dir=SNAPSHOT_DIR):
+    """Returns the archived fetches, oldest first."""
+    try:
+        with open(os.path.join(snapshot_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    return sorted(entries, key=lambda entry: entry['fetched_at'])
+
+
+def iter_snapshot_chunks(blob_path):
+    """Yields the decompressed bytes of an archived page in blocks."""
+    if blob_path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{blob_path} is zstd-compressed; install `zstandard` to read it.")
+        with open(blob_path, 'rb') as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            while block := reader.read(READ_BLOCK_SIZE):
+                yield block
+    else:
+        with gzip.open(blob_path, 'rb') as f:
+            while block := f.read(READ_BLOCK_SIZE):
+                yield block
+
+
+def extract_snapshot(blob_path, venue_match, timezone):
+    """Runs the extractor over one archived page and returns its shows as `(title, date_time_str)` pairs."""
+    # Imported here because the scraper itself imports this module.
+    from scraper import iter_extract_shows
+
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    text_chunks = (decoder.decode(block) for block in iter_snapshot_chunks(blob_path))
+    return [(show.title, show.date_time_str) for show in iter_extract_shows(text_chunks, venue_match, timezone)]
+
+
+def replay_archive(snapshot_dir=SNAPSHOT_DIR, venue_slugs=None, max_workers=None):
+    """Re-extracts every archived page for the selected venues on a process pool.
+
+    Each distinct page is extracted once, however many fetches returned it. Returns a
+    dict mapping each venue slug to its fetches, oldest first, as `(index entry, shows)`
+    pairs where `shows` is a list of `(title, date_time_str)`.
+    """
+    venues = {venue['slug']: venue for venue in get_venues(venue_slugs)}
+    entries = [entry for entry in load_index(snapshot_dir) if entry['venue'] in venues]
+    blobs = sorted({(entry['venue'], entry['blob']) for entry in entries})
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            extract_snapshot,
+            [os.path.join(snapshot_dir, blob) for _, blob in blobs],
+            [venues[slug]['venue_match'] for slug, _ in blobs],
+            [venues[slug]['timezone'] for slug, _ in blobs],
+            chunksize=max(1, len(blobs) // (4 * (max_workers or os.cpu_count() or 1))))
+        shows_by_blob = dict(zip(blobs, results))
+
+    replayed = {slug: [] for slug in venues}
+    for entry in entries:
+        replayed[entry['venue']].append((entry, shows_by_blob[(entry['venue'], entry['blob'])]))
+    return replayed
+
+
+def first_seen_times(fetches):
+    """Returns the earliest fetch time of each show in a venue's replayed fetches.
+
+    Returns `(first_seen, labels)`: canonical key -> earliest fetch time, and canonical
+    key -> its latest `(title, date_time_str)`. A show that only changed its start time
+    between fetches keeps its first-seen time.
+    """
+    from scraper import filter_shows
+
+    first_seen, labels = {}, {}
+    previous_keys = set()
+    for entry, shows in fetches:
+        current_shows = filter_shows([Show(*show) for show in shows])
+        current_keys = {show.key for show in current_shows}
+        if not current_keys:
+            continue
+        first_seen = rekey_timestamps(first_seen, match_moved_keys(previous_keys, current_keys))
+        for show in current_shows:
+            first_seen.setdefault(show.key, entry['fetched_at'])
+            labels[show.key] = (show.title, show.date_time_str)
+        previous_keys = current_keys
+    return first_seen, labels
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Work with the archive of raw venue pages.")
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+    replay_parser = subparsers.add_parser('replay', help="Re-run the extractor over every archived page.")
+    replay_parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR,
+                               help=f"Archive directory (default: {SNAPSHOT_DIR}).")
+    replay_parser.add_argument('--venue', action='append', dest='venues',
+                               help="Only replay this venue (repeatable). Defaults to every registered venue.")
+    replay_parser.add_argument('--workers', type=int, default=None,
+                               help="Worker processes (default: one per CPU).")
+    replay_parser.add_argument('--merge-add-times', action='store_true',
+                               help="Merge the rebuilt first-seen times into each venue's add-times files.")
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    replayed = replay_archive(args.snapshot_dir, args.venues, args.workers)
+    elapsed = time.perf_counter() - start
+    for venue in get_venues(args.venues):
+        fetches = replayed[venue['slug']]
+        print(f"\n--- {venue['name']}: {len(fetches)} archived fetches, "
+              f"{len({entry['blob'] for entry, _ in fetches})} distinct pages ---")
+        for entry, shows in fetches:
+            if not shows:
+                print(f"No shows extracted from the {entry['fetched_at']} fetch ({entry['blob']}).")
+            elif len(shows) != entry['events']:
+                print(f"{entry['fetched_at']}: {len(shows)} shows now, {entry['events']} at fetch time.")
+        first_seen, labels = first_seen_times(fetches)
+        print(f"{len(first_seen)} distinct shows seen across the archive.")
+        if args.merge_add_times and first_seen:
+            merge_first_seen_times(first_seen, venue['show_add_times_file'], venue['show_add_times_archive_file'],
+                                   labels)
+    print(f"\nReplayed in {elapsed:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
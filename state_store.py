@@ -0,0 +1,185 @@
+"""Optional SQLite backend for show state.
+
+Replaces `last_known_shows.txt` and `show_add_times.json` with one indexed table per
+deployment that records when each show was first seen, last seen and removed. The
+new/removed diff runs as a query inside the same transaction as the upsert. The
+CSV and text files are still written, as export views of the table.
+"""
+import sqlite3
+
+from data_manager import get_last_known_shows, load_show_add_time_labels, load_show_add_times
+from show import Show
+from show_identity import canonical_show_key, match_moved_keys
+
+STATE_DB_FILE = "shows.db"
+# Stored in PRAGMA user_version; 2 means every show_key is canonical (see show_identity),
+# including the start time for listings that give one.
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shows (
+    venue TEXT NOT NULL,
+    show_key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date_time_str TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    removed_at TEXT,
+    listing_order INTEGER,
+    PRIMARY KEY (venue, show_key)
+);
+CREATE INDEX IF NOT EXISTS shows_by_status ON shows (venue, removed_at);
+CREATE TABLE IF NOT EXISTS legacy_imports (
+    venue TEXT PRIMARY KEY,
+    imported_at TEXT NOT NULL
+);
+"""
+
+
+def open_state_store(db_path):
+    """Opens (creating if needed) the SQLite state store at `db_path`."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        migrate_show_keys(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def migrate_show_keys(conn):
+    """Rekeys every row to the canonical key of its stored title and date.
+
+    Rows that collapse onto the same canonical key are merged into one that keeps the
+    earliest first-seen time, the latest last-seen time and the most recent listing.
+    """
+    rows = conn.execute(
+        "SELECT venue, show_key, title, date_time_str, first_seen, last_seen, removed_at, listing_order "
+        "FROM shows").fetchall()
+    groups = {}
+    for row in rows:
+        groups.setdefault((row[0], canonical_show_key(row[2], row[3])), []).append(row)
+
+    merged_rows, stale_keys = [], []
+    for (venue, canonical_key), group in groups.items():
+        if len(group) == 1 and group[0][1] == canonical_key:
+            continue
+        stale_keys.extend((venue, row[1]) for row in group)
+        latest = max(group, key=lambda row: (row[6] is None, row[5]))
+        active = any(row[6] is None for row in group)
+        merged_rows.append((venue, canonical_key, latest[2], latest[3], min(row[4] for row in group),
+                            max(row[5] for row in group), None if active else max(row[6] for row in group),
+                            latest[7]))
+    if not stale_keys:
+        return
+
+    with conn:
+        conn.executemany("DELETE FROM shows WHERE venue = ? AND show_key = ?", stale_keys)
+        conn.executemany(
+            "INSERT INTO shows (venue, show_key, title, date_time_str, first_seen, last_seen, removed_at, "
+            "listing_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", merged_rows)
+    print(f"Migrated {len(stale_keys)} show keys in the state store to canonical keys.")
+
+
+def import_legacy_files(conn, venue_slug, last_known_shows_file_path, show_add_times_file_path, now_iso):
+    """Imports a venue's text/JSON state files into the store the first time it is used.
+
+    Shows in the last-known file become active rows; shows only present in the add-times
+    file are recorded as removed at import time. Titles and dates are stored as the files
+    hold them. Returns True if an import happened.
+    """
+    if conn.execute("SELECT 1 FROM legacy_imports WHERE venue = ?", (venue_slug,)).fetchone():
+        return False
+
+    last_known_keys = get_last_known_shows(last_known_shows_file_path)
+    add_times = load_show_add_times(show_add_times_file_path)
+    labels = {**load_show_add_time_labels(show_add_times_file_path), **last_known_keys}
+    rows = []
+    for show_key, (title, date_time_str) in labels.items():
+        first_seen = add_times.get(show_key, now_iso)
+        removed_at = None if show_key in last_known_keys else now_iso
+        rows.append((venue_slug, show_key, title, date_time_str, first_seen, now_iso, removed_at))
+
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO shows (venue, show_key, title, date_time_str, first_seen, last_seen, removed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT INTO legacy_imports (venue, imported_at) VALUES (?, ?)", (venue_slug, now_iso))
+    print(f"Imported {len(rows)} shows for '{venue_slug}' into the state store.")
+    return True
+
+
+def record_scrape(conn, venue_slug, shows_data, now_iso):
+    """Upserts the current listing for a venue and returns `(new_keys, removed_shows)`.
+
+    A show is new if it has no active row; it is removed if it had an active row
+    but is missing from `shows_data`. Rows of shows that only changed their start time
+    are first moved to the new key (see `match_moved_keys`). Both sets are computed by
+    query and the upsert happens in one transaction. `removed_shows` maps each removed
+    key to its stored `(title, date_time_str)`.
+    """
+    with conn:
+        stored_keys = [row[0] for row in conn.execute(
+            "SELECT show_key FROM shows WHERE venue = ?", (venue_slug,))]
+        moved_keys = match_moved_keys(stored_keys, [show.key for show in shows_data])
+        conn.executemany("UPDATE shows SET show_key = ? WHERE venue = ? AND show_key = ?",
+                         [(new_key, venue_slug, old_key) for old_key, new_key in moved_keys.items()])
+
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_shows "
+                     "(show_key TEXT PRIMARY KEY, title TEXT, date_time_str TEXT, listing_order INTEGER)")
+        conn.execute("DELETE FROM current_shows")
+        conn.executemany(
+            "INSERT OR IGNORE INTO current_shows VALUES (?, ?, ?, ?)",
+            [(show.key, show.title, show.date_time_str, i) for i, show in enumerate(shows_data)])
+
+        new_keys = {row[0] for row in conn.execute(
+            "SELECT c.show_key FROM current_shows c "
+            "LEFT JOIN shows s ON s.venue = ? AND s.show_key = c.show_key "
+            "WHERE s.show_key IS NULL OR s.removed_at IS NOT NULL", (venue_slug,))}
+        removed_shows = {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT show_key, title, date_time_str FROM shows WHERE venue = ? AND removed_at IS NULL "
+            "AND show_key NOT IN (SELECT show_key FROM current_shows)", (venue_slug,))}
+
+        conn.execute(
+            "INSERT INTO shows (venue, show_key, title, date_time_str, first_seen, last_seen, removed_at, listing_order) "
+            "SELECT ?, show_key, title, date_time_str, ?, ?, NULL, listing_order FROM current_shows WHERE true "
+            "ON CONFLICT (venue, show_key) DO UPDATE SET "
+            "title = excluded.title, date_time_str = excluded.date_time_str, "
+            "last_seen = excluded.last_seen, removed_at = NULL, listing_order = excluded.listing_order",
+            (venue_slug, now_iso, now_iso))
+        conn.execute(
+            "UPDATE shows SET removed_at = ?, listing_order = NULL WHERE venue = ? AND removed_at IS NULL "
+            "AND show_key NOT IN (SELECT show_key FROM current_shows)", (now_iso, venue_slug))
+
+    return new_keys, removed_shows
+
+
+def get_active_shows(conn, venue_slug):
+    """Returns the venue's currently listed shows, in listing order, as Shows."""
+    return [Show(title, date_time_str) for title, date_time_str in conn.execute(
+        "SELECT title, date_time_str FROM shows WHERE venue = ? AND removed_at IS NULL "
+        "ORDER BY listing_order", (venue_slug,))]
+
+
+def get_first_seen_times(conn, venue_slug):
+    """Returns a show-key -> first-seen ISO timestamp mapping for the venue's active shows."""
+    return dict(conn.execute(
+        "SELECT show_key, first_seen FROM shows WHERE venue = ? AND removed_at IS NULL", (venue_slug,)))
+
+
+def backfill_show_history(conn, venue_slug, first_seen, removed_at, labels):
+    """Merges show history rebuilt from older snapshots (see backfill.py) into the store.
+
+    Existing rows only ever move their first-seen time earlier. Shows the store has never
+    seen that were removed before it existed are added as removed rows. `labels` maps
+    each show key to its `(title, date_time_str)`.
+    """
+    with conn:
+        conn.executemany(
+            "UPDATE shows SET first_seen = MIN(first_seen, ?) WHERE venue = ? AND show_key = ?",
+            [(seen_at, venue_slug, show_key) for show_key, seen_at in first_seen.items()])
+        inserted = conn.executemany(
+            "INSERT OR IGNORE INTO shows (venue, show_key, title, date_time_str, first_seen, last_seen, removed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(venue_slug, show_key, *labels[show_key], first_seen[show_key], removed, removed)
+             for show_key, removed in removed_at.items()]).rowcount
+    print(f"Backfilled first-seen times for '{venue_slug}' and added {inserted} removed shows to the state store.")
@@ -0,0 +1,99 @@
+"""Calendar sync against the in-memory fake service: events deleted outside the script, and retries."""
+import contextlib
+import io
+
+from benchmark import FakeCalendarService, FakeHttpError
+from calendar_scheduler import ServicePool, TokenBucket
+from google_calendar_service import apply_calendar_operations, build_show_event_body, sync_calendar_events
+from show import Show
+
+URL = "https://example.test/ruoff"
+
+
+def event_bodies(*shows):
+    return {show.key: build_show_event_body(show, URL) for show in shows}
+
+
+def sync(service, desired_events, event_map):
+    with contextlib.redirect_stdout(io.StringIO()), ServicePool(lambda: service) as service_pool:
+        return sync_calendar_events(lambda: service, desired_events, event_map, calendar_id='test',
+                                    service_pool=service_pool, rate_limiter=TokenBucket(1000, 1000))
+
+
+KESHA = Show.from_scrape("Kesha", "2026-08-30T19:00")
+KESHA_LATER = Show.from_scrape("Kesha", "2026-08-30T21:00")
+BABYMETAL = Show.from_scrape("BABYMETAL", "2026-09-05T19:30")
+
+
+def test_patch_of_a_deleted_event_inserts_it_again():
+    service = FakeCalendarService()
+    event_map = {}
+    assert sync(service, event_bodies(KESHA, BABYMETAL), event_map) == []
+    service.stored_events.pop(event_map[KESHA.key]['id'])
+
+    desired_events = event_bodies(BABYMETAL)
+    desired_events[KESHA.key] = build_show_event_body(KESHA_LATER, URL)
+    assert sync(service, desired_events, event_map) == []
+
+    assert set(event_map) == {KESHA.key, BABYMETAL.key}
+    assert service.stored_events[event_map[KESHA.key]['id']]['start'] == desired_events[KESHA.key]['start']
+    assert len(service.stored_events) == 2
+
+
+def test_delete_of_a_deleted_event_is_done():
+    service = FakeCalendarService()
+    event_map = {}
+    sync(service, event_bodies(KESHA, BABYMETAL), event_map)
+    service.stored_events.pop(event_map[KESHA.key]['id'])
+
+    assert sync(service, event_bodies(BABYMETAL), event_map) == []
+    assert set(event_map) == {BABYMETAL.key}
+
+
+class FailingRequest:
+    def execute(self, apply_latency=True):
+        raise FakeHttpError(400)
+
+
+class FailingInsertService(FakeCalendarService):
+    """Rejects every insert while `failing` is set."""
+    failing = True
+
+    def events(self):
+        events = super().events()
+        if self.failing:
+            events.insert = lambda calendarId, body: FailingRequest()
+        return events
+
+
+def test_failed_operations_are_queued_and_replayed():
+    service = FailingInsertService()
+    event_map = {}
+    failed = sync(service, event_bodies(KESHA), event_map)
+    assert [(operation['op'], operation['key'], operation['attempts']) for operation in failed] == [
+        ('insert', KESHA.key, 1)]
+    assert event_map == {}
+
+    service.failing = False
+    with contextlib.redirect_stdout(io.StringIO()), ServicePool(lambda: service) as service_pool:
+        assert apply_calendar_operations(failed, event_map, 'test', service_pool=service_pool,
+                                         rate_limiter=TokenBucket(1000, 1000)) == []
+    assert set(event_map) == {KESHA.key}
+
+
+def test_service_pool_builds_one_service_per_worker():
+    service = FakeCalendarService()
+    builds = []
+
+    def build_service():
+        builds.append(1)
+        return service
+
+    event_map = {}
+    shows = [Show.from_scrape(f"Show {i}", f"2026-08-{i + 1:02d}T19:00") for i in range(19)]
+    with contextlib.redirect_stdout(io.StringIO()), ServicePool(build_service, max_workers=2) as service_pool:
+        for stop in (7, 13, 19):
+            sync_calendar_events(lambda: service, event_bodies(*shows[:stop]), event_map, calendar_id='test',
+                                 service_pool=service_pool, rate_limiter=TokenBucket(1000, 1000))
+    assert len(event_map) == 19
+    assert len(builds) <= 2
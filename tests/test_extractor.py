@@ -0,0 +1,81 @@
+"""Regression corpus for the single-pass extractor.
+
+The fixture pages use the escaped-JSON format Live Nation embeds in its streaming
+script tags. Results are compared with the original 1000-character lookback
+extractor, reproduced below as the reference.
+"""
+import os
+import re
+
+import pytest
+
+from scraper import MAX_CARRY_CHARS, extract_shows, iter_extract_shows
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def lookback_extract(content, venue_match="Ruoff"):
+    """The extractor as it was before the single-pass rewrite, returning `(title, date_time_str)` pairs."""
+    name_pattern = r'\\"name\\":\\"(.*?)\\"'
+    date_pattern = r'\\"start_date_local\\":\\"(.*?)\\"'
+    venue_pattern = r'\\"venue_name\\":\\"(.*?)\\"'
+    shows = []
+    for m in re.finditer(date_pattern, content):
+        lookback = content[max(0, m.start() - 1000):m.start()]
+        name_match = re.findall(name_pattern, lookback)
+        venue = re.findall(venue_pattern, lookback)
+        if name_match and venue_match in (venue[-1] if venue else "Unknown"):
+            shows.append((name_match[-1].replace('\\"', '"').replace("\\'", "'"), m.group(1)))
+    return shows
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def extracted(shows):
+    return [(show.title, show.date_time_str) for show in shows]
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_listing_matches_lookback_extractor():
+    content = load_fixture('ruoff_listing.html')
+    shows = extracted(extract_shows(content))
+    assert shows == lookback_extract(content)
+    assert len(shows) == 6
+    assert ("Kesha: The Freedom Tour", "2026-08-30") in shows
+    assert all("Decoy" not in title and "Another Venue" not in title for title, _ in shows)
+
+
+def test_long_gap_finds_what_lookback_misses():
+    content = load_fixture('long_gap.html')
+    shows = extracted(extract_shows(content))
+    old_shows = lookback_extract(content)
+    assert set(old_shows) < set(shows)
+    missed = [show for show in shows if show not in old_shows]
+    assert missed == [
+        ("Outlaw Festival: Willie Nelson, Avett Brothers, Lukas Nelson \\u0026 More!", "2026-08-23"),
+        ("Tim McGraw: Pawn Shop Guitar Tour 2026", "2026-09-18"),
+    ]
+    # The name of the last missed show is further back than the carried tail can reach.
+    name_at = content.index("Tim McGraw")
+    assert content.index("2026-09-18") - name_at > MAX_CARRY_CHARS
+
+
+@pytest.mark.parametrize('fixture', ['ruoff_listing.html', 'long_gap.html'])
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1000, MAX_CARRY_CHARS + 1])
+def test_chunked_extraction_matches_whole_page(fixture, chunk_size):
+    content = load_fixture(fixture)
+    expected = extracted(extract_shows(content))
+    assert extracted(iter_extract_shows(chunked(content, chunk_size))) == expected
+
+
+def test_key_split_across_chunk_boundary():
+    content = load_fixture('ruoff_listing.html')
+    split_at = content.index('start_date_local') + 5
+    shows = extracted(iter_extract_shows([content[:split_at], content[split_at:]]))
+    assert shows == extracted(extract_shows(content))
@@ -0,0 +1,20 @@
+"""iCalendar UIDs stay put when only a show's start time changes."""
+from ics_generator import render_ics_feed
+from show import Show
+
+
+def feed_uids(*shows):
+    feed = "".join(render_ics_feed(shows, {}, 'ruoff', 'Ruoff Music Center', 'https://example.test/ruoff'))
+    return [line[4:] for line in feed.split("\r\n") if line.startswith("UID:")]
+
+
+def test_uid_survives_a_time_change():
+    assert feed_uids(Show.from_scrape("Kesha", "2026-08-30")) == \
+        feed_uids(Show.from_scrape("Kesha", "Sun Aug 30, 2026 ▪︎ 7PM")) == \
+        feed_uids(Show.from_scrape("Kesha", "2026-08-30T21:00"))
+
+
+def test_shows_on_the_same_day_get_their_own_uids():
+    uids = feed_uids(Show.from_scrape("KIDZ BOP LIVE", "Sat Aug 29, 2026 ▪︎ 2PM"),
+                     Show.from_scrape("KIDZ BOP LIVE", "Sat Aug 29, 2026 ▪︎ 7PM"))
+    assert len(set(uids)) == 2
@@ -0,0 +1,77 @@
+"""Canonical show keys, and carrying state over when only a show's start time changes."""
+import sqlite3
+
+from data_manager import compute_shows_hash
+from show import Show
+from show_identity import canonical_key_for, match_moved_keys
+from state_store import SCHEMA, get_first_seen_times, open_state_store, record_scrape
+
+TIMEZONE = 'America/New_York'
+
+
+def show(title, date_time_str):
+    return Show.from_scrape(title, date_time_str, TIMEZONE)
+
+
+def test_key_keeps_the_listed_time():
+    assert show("Tim McGraw", "2026-08-29T19:00").key == "tim mcgraw|2026-08-29T19:00"
+    assert show("Tim McGraw", "2026-08-29").key == "tim mcgraw|2026-08-29"
+
+
+def test_matinee_and_evening_shows_stay_apart():
+    matinee = show("KIDZ BOP LIVE", "Sat Aug 29, 2026 ▪︎ 2PM")
+    evening = show("KIDZ BOP LIVE", "Sat Aug 29, 2026 ▪︎ 7PM")
+    assert matinee.key != evening.key
+
+
+def test_keys_match_across_listing_formats():
+    old_format = show("Rob Zombie \\u0026 Marilyn Manson", "Sun Sep 6, 2026 ▪︎ 7:30PM")
+    iso_format = show("Rob Zombie & Marilyn Manson", "2026-09-06T19:30")
+    assert old_format.key == iso_format.key
+
+
+def test_canonical_keys_are_stable():
+    for listing in ["Sun Sep 6, 2026 ▪︎ 7:30PM", "2026-09-06", "TBA"]:
+        key = show("Kesha", listing).key
+        assert canonical_key_for(key) == key
+
+
+def test_time_added_or_changed_is_matched():
+    assert match_moved_keys({"kesha|2026-08-30"}, {"kesha|2026-08-30T19:00"}) == {
+        "kesha|2026-08-30": "kesha|2026-08-30T19:00"}
+    assert match_moved_keys({"kesha|2026-08-30T19:00"}, {"kesha|2026-08-30T21:00"}) == {
+        "kesha|2026-08-30T19:00": "kesha|2026-08-30T21:00"}
+
+
+def test_ambiguous_times_are_not_matched():
+    stored = {"kidz bop live|2026-08-29T14:00", "kidz bop live|2026-08-29T19:00"}
+    assert match_moved_keys(stored, {"kidz bop live|2026-08-29"}) == {}
+    assert match_moved_keys({"kidz bop live|2026-08-29"}, stored) == {}
+    assert match_moved_keys(stored, stored | {"kidz bop live|2026-08-29T11:00"}) == {}
+
+
+def test_shows_hash_sees_a_time_only_reschedule():
+    before = [show("Kesha", "Sun Aug 30, 2026 ▪︎ 7PM")]
+    after = [show("Kesha", "Sun Aug 30, 2026 ▪︎ 9PM")]
+    assert compute_shows_hash(before) != compute_shows_hash(after)
+
+
+def test_state_store_keeps_a_rescheduled_show():
+    conn = open_state_store(':memory:')
+    record_scrape(conn, 'ruoff', [show("Kesha", "Sun Aug 30, 2026 ▪︎ 7PM")], '2026-06-01T00:00:00')
+    new_keys, removed_keys = record_scrape(conn, 'ruoff', [show("Kesha", "Sun Aug 30, 2026 ▪︎ 9PM")],
+                                           '2026-06-02T00:00:00')
+    assert (new_keys, removed_keys) == (set(), {})
+    assert get_first_seen_times(conn, 'ruoff') == {"kesha|2026-08-30T21:00": '2026-06-01T00:00:00'}
+
+
+def test_state_store_migration_adds_listed_times(tmp_path):
+    db_path = str(tmp_path / 'shows.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT INTO shows (venue, show_key, title, date_time_str, first_seen, last_seen) "
+                 "VALUES ('ruoff', 'kesha|2026-08-30', 'Kesha', 'Sun Aug 30, 2026 ▪︎ 7PM', '2026-06-01', '2026-06-02')")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+    assert get_first_seen_times(open_state_store(db_path), 'ruoff') == {"kesha|2026-08-30T19:00": '2026-06-01'}
@@ -0,0 +1,70 @@
+"""The text and SQLite state keep titles and dates as listed, while diffs use canonical keys."""
+import gzip
+import json
+
+from data_manager import (
+    compact_show_add_times, get_last_known_shows, load_archived_show_add_times, load_show_add_time_labels,
+    load_show_add_times, save_current_shows_as_known, save_show_add_times
+)
+from show import Show
+from state_store import get_active_shows, import_legacy_files, open_state_store, record_scrape
+
+SHOWS = [Show.from_scrape("Rob Zombie \\u0026 Marilyn Manson", "2026-09-06"),
+         Show.from_scrape("KIDZ BOP LIVE", "Sat Aug 29, 2026 ▪︎ 2PM")]
+LAST_KNOWN_LINES = "Rob Zombie \\u0026 Marilyn Manson|2026-09-06\nKIDZ BOP LIVE|Sat Aug 29, 2026 ▪︎ 2PM\n"
+
+
+def test_last_known_file_is_written_as_listed(tmp_path):
+    path = tmp_path / 'last_known_shows.txt'
+    save_current_shows_as_known(SHOWS, str(path))
+    assert path.read_text(encoding='utf-8') == LAST_KNOWN_LINES
+    assert get_last_known_shows(str(path)) == {
+        "rob zombie & marilyn manson|2026-09-06": ("Rob Zombie \\u0026 Marilyn Manson", "2026-09-06"),
+        "kidz bop live|2026-08-29T14:00": ("KIDZ BOP LIVE", "Sat Aug 29, 2026 ▪︎ 2PM"),
+    }
+
+
+def test_legacy_import_keeps_listed_labels(tmp_path):
+    last_known_path = tmp_path / 'last_known_shows.txt'
+    last_known_path.write_text(LAST_KNOWN_LINES, encoding='utf-8')
+    add_times_path = tmp_path / 'show_add_times.json'
+    add_times_path.write_text(json.dumps({"Kesha|Sun Aug 30, 2026 ▪︎ 7PM": "2026-06-01T00:00:00"}),
+                              encoding='utf-8')
+    conn = open_state_store(':memory:')
+    assert import_legacy_files(conn, 'ruoff', str(last_known_path), str(add_times_path), '2026-06-02T00:00:00')
+
+    assert {(show.title, show.date_time_str) for show in get_active_shows(conn, 'ruoff')} == {
+        (show.title, show.date_time_str) for show in SHOWS}
+    assert conn.execute("SELECT title, date_time_str, removed_at FROM shows WHERE show_key = ?",
+                        ("kesha|2026-08-30T19:00",)).fetchone() == (
+        "Kesha", "Sun Aug 30, 2026 ▪︎ 7PM", '2026-06-02T00:00:00')
+
+
+def test_removed_shows_come_back_with_listed_labels():
+    conn = open_state_store(':memory:')
+    record_scrape(conn, 'ruoff', SHOWS, '2026-06-01T00:00:00')
+    new_keys, removed_shows = record_scrape(conn, 'ruoff', SHOWS[:1], '2026-06-02T00:00:00')
+    assert new_keys == set()
+    assert removed_shows == {"kidz bop live|2026-08-29T14:00": ("KIDZ BOP LIVE", "Sat Aug 29, 2026 ▪︎ 2PM")}
+
+
+def test_add_times_keep_listed_keys(tmp_path):
+    add_times_path = str(tmp_path / 'show_add_times.json')
+    archive_path = str(tmp_path / 'show_add_times_archive.json.gz')
+    with open(add_times_path, 'w', encoding='utf-8') as f:
+        json.dump({"Kesha|Sun Aug 30, 2026 ▪︎ 7PM": "2026-06-01T00:00:00",
+                   "KIDZ BOP LIVE|Sat Aug 29, 2026 ▪︎ 2PM": "2026-06-01T00:00:00"}, f)
+
+    labels = load_show_add_time_labels(add_times_path)
+    labels.update((show.key, (show.title, show.date_time_str)) for show in SHOWS)
+    add_times = load_show_add_times(add_times_path)
+    add_times[SHOWS[0].key] = "2026-06-02T00:00:00"
+    add_times = compact_show_add_times(add_times, {show.key for show in SHOWS}, archive_path, labels=labels)
+    save_show_add_times(add_times, add_times_path, labels)
+
+    with open(add_times_path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {"KIDZ BOP LIVE|Sat Aug 29, 2026 ▪︎ 2PM": "2026-06-01T00:00:00",
+                                "Rob Zombie \\u0026 Marilyn Manson|2026-09-06": "2026-06-02T00:00:00"}
+    with gzip.open(archive_path, 'rt', encoding='utf-8') as f:
+        assert json.load(f) == {"Kesha|Sun Aug 30, 2026 ▪︎ 7PM": "2026-06-01T00:00:00"}
+    assert load_archived_show_add_times(archive_path) == {"kesha|2026-08-30T19:00": "2026-06-01T00:00:00"}
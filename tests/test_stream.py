@@ -0,0 +1,67 @@
+"""stream_shows must not pass off a page that broke off partway as the whole listing."""
+import os
+
+import requests
+
+from scraper import scrape_venues
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'ruoff_listing.html')
+VENUE = {'slug': 'ruoff', 'name': 'Ruoff Music Center', 'url': 'https://example.test/ruoff',
+         'venue_match': 'Ruoff', 'timezone': 'America/New_York'}
+
+
+class FakeResponse:
+    status_code = 200
+    encoding = 'utf-8'
+    headers = {'ETag': '"new"', 'Last-Modified': 'Sat, 17 Oct 2026 00:00:00 GMT'}
+
+    def __init__(self, body, break_at=None):
+        self.body = body
+        self.break_at = break_at
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def iter_content(self, chunk_size):
+        end = self.break_at or len(self.body)
+        for start in range(0, end, 512):
+            yield self.body[start:min(start + 512, end)]
+        if self.break_at:
+            raise requests.exceptions.ChunkedEncodingError("Connection reset by peer")
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+def scrape(break_at=None):
+    with open(FIXTURE, 'rb') as f:
+        body = f.read()
+    http_caches = {'ruoff': {'etag': '"old"', 'events_hash': 'previous'}}
+    shows = scrape_venues([VENUE], http_caches, session=FakeSession(FakeResponse(body, break_at)))['ruoff']
+    return shows, http_caches['ruoff']
+
+
+def test_complete_download_records_validators():
+    shows, http_cache = scrape()
+    assert len(shows) == 6
+    assert http_cache['etag'] == '"new"'
+
+
+def test_broken_download_yields_nothing_and_keeps_validators():
+    shows, http_cache = scrape(break_at=1500)
+    assert shows == []
+    assert http_cache == {'etag': '"old"', 'events_hash': 'previous'}
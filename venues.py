@@ -0,0 +1,62 @@
+"""Registry of the Live Nation venues tracked by this project.
+
+Each entry names the page to scrape, the text that identifies the venue in the
+page's event data and the calendar its shows are synced to. State and report file
+names default to ones derived from the slug; an entry can override any of them.
+"""
+from google_calendar_service import TARGET_CALENDAR_ID
+from show import DEFAULT_EVENT_TIMEZONE
+
+VENUES = [
+    {
+        "slug": "ruoff",
+        "name": "Ruoff Music Center",
+        "url": "https://www.livenation.com/venue/KovZpvEk7A/ruoff-music-center-events",
+        "venue_match": "Ruoff",
+        "calendar_id": TARGET_CALENDAR_ID,
+        # Ruoff predates the registry, so it keeps its original file names.
+        "shows_csv_file": "ruoff_shows.csv",
+        "last_known_shows_file": "last_known_shows.txt",
+        "show_add_times_file": "show_add_times.json",
+        "show_add_times_archive_file": "show_add_times_archive.json.gz",
+        "scrape_cache_file": "scrape_cache.json",
+        "calendar_event_map_file": "calendar_events.json",
+        "calendar_retry_queue_file": "calendar_retry_queue.json",
+        "report_file": "docs/index.html",
+        "report_copy_file": "ruoff_shows.html",
+        "ics_file": "docs/shows.ics",
+    },
+]
+
+DEFAULT_VENUE_FIELDS = {
+    "timezone": DEFAULT_EVENT_TIMEZONE,
+    "shows_csv_file": "{slug}_shows.csv",
+    "last_known_shows_file": "{slug}_last_known_shows.txt",
+    "show_add_times_file": "{slug}_show_add_times.json",
+    "show_add_times_archive_file": "{slug}_show_add_times_archive.json.gz",
+    "scrape_cache_file": "{slug}_scrape_cache.json",
+    "calendar_event_map_file": "{slug}_calendar_events.json",
+    "calendar_retry_queue_file": "{slug}_calendar_retry_queue.json",
+    "report_file": "docs/{slug}.html",
+    "report_copy_file": None,
+    "ics_file": "docs/{slug}.ics",
+}
+
+
+def get_venues(slugs=None):
+    """Returns the registered venues, optionally limited to `slugs`, with defaults filled in."""
+    known_slugs = {venue["slug"] for venue in VENUES}
+    unknown = set(slugs or ()) - known_slugs
+    if unknown:
+        raise ValueError(f"Unknown venue(s): {', '.join(sorted(unknown))}")
+
+    venues = []
+    for entry in VENUES:
+        if slugs and entry["slug"] not in slugs:
+            continue
+        venue = {}
+        for field, default in DEFAULT_VENUE_FIELDS.items():
+            venue[field] = default.format(slug=entry["slug"]) if isinstance(default, str) else default
+        venue.update(entry)
+        venues.append(venue)
+    return venues